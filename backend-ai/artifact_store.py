@@ -0,0 +1,300 @@
+"""
+Content-addressed storage for generated code and test files
+Artifacts are written as <kind>_<sha256[:12]>.py so identical generations
+share one file, and a SQLite manifest indexes them for listings, cache
+validators (ETag / Last-Modified) and retention-based garbage collection.
+A shared file can belong to many runs, so run membership lives in its own
+artifact_runs table rather than on the artifact row.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ARTIFACT_KINDS = ("code", "test")
+SAFE_FILENAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*\.py$")
+MANIFEST_NAME = ".manifest.db"
+
+SORTABLE_COLUMNS = ("created_at", "size", "filename")
+MAX_PAGE_SIZE = 500
+
+COLUMNS = ("filename", "kind", "digest", "size", "created_at", "last_used_at", "refs", "workflow_id")
+
+
+def is_safe_filename(filename: str) -> bool:
+    """Plain file names only - no separators, parent references or hidden files"""
+    return bool(SAFE_FILENAME.match(filename)) and ".." not in filename
+
+
+def encode_cursor(value: Any, filename: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, filename]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    try:
+        value, filename = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return value, filename
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+class ArtifactStore:
+    """Deduplicating artifact directory with a manifest index"""
+
+    def __init__(self, root: Path, manifest_path: Optional[Path] = None,
+                 max_age_seconds: float = 0, max_artifacts: int = 0, gc_every: int = 50):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_age_seconds = max_age_seconds
+        self.max_artifacts = max_artifacts
+        self.gc_every = gc_every
+        self._puts_since_gc = 0
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.dedup_hits = 0
+        self.collected = 0
+
+        self._db = sqlite3.connect(str(manifest_path or self.root / MANIFEST_NAME), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            "filename TEXT PRIMARY KEY, kind TEXT NOT NULL, digest TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_used_at REAL NOT NULL, refs INTEGER NOT NULL DEFAULT 1, workflow_id TEXT)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(artifacts)")}
+        if "legacy" not in columns:
+            # Rows indexed by import_existing(); files other code still reads by name, so GC never touches them
+            self._db.execute("ALTER TABLE artifacts ADD COLUMN legacy INTEGER NOT NULL DEFAULT 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_artifacts_kind_created ON artifacts(kind, created_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_artifacts_last_used ON artifacts(last_used_at)")
+        # Keyset pagination walks these indexes, so a page costs the same at any catalog size
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_artifacts_created ON artifacts(created_at, filename)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_artifacts_size ON artifacts(size, filename)")
+        self._db.execute("DROP INDEX IF EXISTS ix_artifacts_workflow")
+        # artifacts.workflow_id is only the first producer; every run that generated the content is linked here
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS artifact_runs ("
+            "workflow_id TEXT NOT NULL, filename TEXT NOT NULL, linked_at REAL NOT NULL, "
+            "PRIMARY KEY (workflow_id, filename))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_artifact_runs_filename ON artifact_runs(filename)")
+        self._db.execute(
+            "INSERT OR IGNORE INTO artifact_runs (workflow_id, filename, linked_at) "
+            "SELECT workflow_id, filename, created_at FROM artifacts WHERE workflow_id IS NOT NULL"
+        )
+        self._db.commit()
+
+    def put(self, kind: str, content: str, workflow_id: Optional[str] = None) -> Dict[str, Any]:
+        """Store content once; repeated identical generations just bump the reference count"""
+        if kind not in ARTIFACT_KINDS:
+            raise ValueError(f"Unknown artifact kind '{kind}'")
+        data = content.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        filename = f"{kind}_{digest[:12]}.py"
+        path = self.root / filename
+        now = time.time()
+
+        with self._lock:
+            row = self._row(filename)
+            if row is not None and path.exists():
+                self._db.execute(
+                    "UPDATE artifacts SET last_used_at = ?, refs = refs + 1 WHERE filename = ?", (now, filename)
+                )
+                self._link(workflow_id, filename, now)
+                self._db.commit()
+                self.dedup_hits += 1
+                return {**row, "last_used_at": now, "refs": row["refs"] + 1, "deduplicated": True}
+
+            self._write_atomic(path, data)
+            self._db.execute(
+                "INSERT OR REPLACE INTO artifacts (filename, kind, digest, size, created_at, last_used_at, refs, workflow_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, 1, ?)",
+                (filename, kind, digest, len(data), now, now, workflow_id)
+            )
+            self._link(workflow_id, filename, now)
+            self._db.commit()
+            self.writes += 1
+            self._puts_since_gc += 1
+            run_gc = self.gc_every and self._puts_since_gc >= self.gc_every
+
+        if run_gc:
+            self.gc()
+        return {"filename": filename, "kind": kind, "digest": digest, "size": len(data),
+                "created_at": now, "last_used_at": now, "refs": 1, "workflow_id": workflow_id, "deduplicated": False}
+
+    def _link(self, workflow_id: Optional[str], filename: str, now: float):
+        if workflow_id:
+            self._db.execute(
+                "INSERT OR IGNORE INTO artifact_runs (workflow_id, filename, linked_at) VALUES (?, ?, ?)",
+                (workflow_id, filename, now)
+            )
+
+    def _write_atomic(self, path: Path, data: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=str(self.root), prefix=".tmp_", suffix=".py")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _row(self, filename: str) -> Optional[Dict[str, Any]]:
+        row = self._db.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM artifacts WHERE filename = ?", (filename,)
+        ).fetchone()
+        return dict(zip(COLUMNS, row)) if row else None
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Manifest entry for a file, or None for unknown / unsafe names"""
+        if not is_safe_filename(filename):
+            return None
+        with self._lock:
+            return self._row(filename)
+
+    def path_for(self, filename: str) -> Optional[Path]:
+        """Resolved path of an indexed artifact that still exists on disk"""
+        if self.get(filename) is None:
+            return None
+        path = (self.root / filename).resolve()
+        if path.parent != self.root.resolve() or not path.is_file():
+            return None
+        return path
+
+    def list(self, kind: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Newest first, served from the index without touching the directory"""
+        query = f"SELECT {', '.join(COLUMNS)} FROM artifacts"
+        params: List[Any] = []
+        if kind:
+            query += " WHERE kind = ?"
+            params.append(kind)
+        query += " ORDER BY created_at DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [dict(zip(COLUMNS, row)) for row in self._db.execute(query, params)]
+
+    def list_page(self, limit: int = 50, cursor: Optional[str] = None, kind: Optional[str] = None,
+                  workflow_id: Optional[str] = None, prefix: Optional[str] = None,
+                  sort: str = "created_at", order: str = "desc") -> Dict[str, Any]:
+        """One page of the catalog plus an opaque cursor for the next page (None at the end)"""
+        if sort not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot sort by '{sort}'")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Invalid sort order '{order}'")
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        compare = "<" if order == "desc" else ">"
+
+        clauses: List[str] = []
+        params: List[Any] = []
+        if kind:
+            clauses.append("kind = ?")
+            params.append(kind)
+        if workflow_id:
+            clauses.append("filename IN (SELECT filename FROM artifact_runs WHERE workflow_id = ?)")
+            params.append(workflow_id)
+        if prefix:
+            clauses.append("filename >= ? AND filename < ?")
+            params.extend([prefix, prefix + "\uffff"])
+        if cursor:
+            last_value, last_filename = decode_cursor(cursor)
+            clauses.append(f"({sort} {compare} ? OR ({sort} = ? AND filename {compare} ?))")
+            params.extend([last_value, last_value, last_filename])
+
+        query = f"SELECT {', '.join(COLUMNS)} FROM artifacts"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += f" ORDER BY {sort} {order.upper()}, filename {order.upper()} LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = [dict(zip(COLUMNS, row)) for row in self._db.execute(query, params)]
+        if workflow_id:
+            # Report the run that was asked about, not whichever run wrote the shared file first
+            for row in rows:
+                row["workflow_id"] = workflow_id
+        items = rows[:limit]
+        next_cursor = encode_cursor(items[-1][sort], items[-1]["filename"]) if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    def list_all(self, **filters: Any) -> List[Dict[str, Any]]:
+        """Every matching entry, fetched page by page with list_page's filters and ordering"""
+        items: List[Dict[str, Any]] = []
+        cursor = None
+        while True:
+            page = self.list_page(limit=MAX_PAGE_SIZE, cursor=cursor, **filters)
+            items.extend(page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return items
+
+    def import_existing(self) -> int:
+        """Index .py files written before the manifest existed (e.g. legacy timestamped names)"""
+        imported = 0
+        with self._lock:
+            known = {row[0] for row in self._db.execute("SELECT filename FROM artifacts")}
+            for path in self.root.glob("*.py"):
+                if path.name in known or not is_safe_filename(path.name):
+                    continue
+                data = path.read_bytes()
+                mtime = path.stat().st_mtime
+                kind = "test" if path.name.startswith("test_") else "code"
+                self._db.execute(
+                    "INSERT INTO artifacts (filename, kind, digest, size, created_at, last_used_at, refs, workflow_id, legacy) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 1, NULL, 1)",
+                    (path.name, kind, hashlib.sha256(data).hexdigest(), len(data), mtime, mtime)
+                )
+                imported += 1
+            self._db.commit()
+        return imported
+
+    def gc(self, max_age_seconds: Optional[float] = None, max_artifacts: Optional[int] = None) -> int:
+        """Drop artifacts unused for max_age_seconds and everything beyond the newest max_artifacts (0 = no limit)
+        Imported legacy files are never collected"""
+        max_age = self.max_age_seconds if max_age_seconds is None else max_age_seconds
+        max_count = self.max_artifacts if max_artifacts is None else max_artifacts
+        with self._lock:
+            self._puts_since_gc = 0
+            doomed = set()
+            if max_age:
+                doomed.update(row[0] for row in self._db.execute(
+                    "SELECT filename FROM artifacts WHERE legacy = 0 AND last_used_at < ?", (time.time() - max_age,)
+                ))
+            if max_count:
+                doomed.update(row[0] for row in self._db.execute(
+                    "SELECT filename FROM artifacts WHERE legacy = 0 ORDER BY last_used_at DESC LIMIT -1 OFFSET ?", (max_count,)
+                ))
+            for filename in doomed:
+                try:
+                    (self.root / filename).unlink()
+                except FileNotFoundError:
+                    pass
+                self._db.execute("DELETE FROM artifacts WHERE filename = ?", (filename,))
+                self._db.execute("DELETE FROM artifact_runs WHERE filename = ?", (filename,))
+            self._db.commit()
+            self.collected += len(doomed)
+        return len(doomed)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total_size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+            return {
+                "artifacts": count,
+                "total_size": total_size,
+                "writes": self.writes,
+                "dedup_hits": self.dedup_hits,
+                "collected": self.collected
+            }
@@ -0,0 +1,124 @@
+"""
+Prompt -> completion cache for local model agents
+Two tiers: an in-memory LRU and an optional SQLite file with TTL and
+size-based eviction. Keys cover the model name, the effective model
+parameters and the whitespace-normalized prompt.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so re-indented or re-wrapped prompts share an entry"""
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+def make_cache_key(model_name: str, model_config: Dict[str, Any], prompt: str) -> str:
+    payload = json.dumps(
+        {"model": model_name, "config": model_config, "prompt": normalize_prompt(prompt)},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """Thread-safe LRU completion cache with an optional SQLite tier"""
+
+    def __init__(self, max_entries: int = 256, db_path: Optional[str] = None,
+                 ttl_seconds: float = 7 * 24 * 3600, max_disk_entries: int = 5000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, completion TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_completions_created_at ON completions(created_at)")
+            self._db.commit()
+
+    def get(self, model_name: str, model_config: Dict[str, Any], prompt: str) -> Optional[str]:
+        key = make_cache_key(model_name, model_config, prompt)
+        with self._lock:
+            completion = self._memory.get(key)
+            if completion is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return completion
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT completion FROM completions WHERE key = ? AND created_at >= ?",
+                    (key, time.time() - self.ttl_seconds)
+                ).fetchone()
+                if row:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._remember(key, row[0])
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, model_name: str, model_config: Dict[str, Any], prompt: str, completion: str):
+        if not completion:
+            return
+        key = make_cache_key(model_name, model_config, prompt)
+        with self._lock:
+            self._remember(key, completion)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO completions (key, completion, created_at) VALUES (?, ?, ?)",
+                    (key, completion, time.time())
+                )
+                self._evict_disk()
+                self._db.commit()
+
+    def _remember(self, key: str, completion: str):
+        self._memory[key] = completion
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        self._db.execute("DELETE FROM completions WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        self._db.execute(
+            "DELETE FROM completions WHERE key IN ("
+            "SELECT key FROM completions ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM completions")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_enabled": self._db is not None
+            }
@@ -7,13 +7,54 @@ import os
 import asyncio
 from datetime import datetime
 from typing import List, Dict, Any, Optional
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, JSON, ForeignKey
+from sqlalchemy import create_engine, event, select, Column, Integer, String, Text, DateTime, Boolean, JSON, ForeignKey, Index, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import BaseModel
 import uuid
 
+# Async engine is optional - falls back to running sync sessions in a thread
+try:
+    import aiosqlite  # noqa: F401
+    import greenlet  # noqa: F401  - required by SQLAlchemy's asyncio extension
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    ASYNC_DB_AVAILABLE = True
+    ASYNC_DB_IMPORT_ERROR = None
+except ImportError as e:
+    ASYNC_DB_AVAILABLE = False
+    ASYNC_DB_IMPORT_ERROR = str(e)
+
+# =============================================================================
+# SQLITE STORAGE PROFILE
+# =============================================================================
+# main.py and online_agent_service.py share agent_system.db. WAL lets readers
+# run alongside a writer, and the busy timeout makes concurrent writers wait
+# instead of failing with "database is locked".
+
+SQLITE_PROFILE = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+DB_ASYNC_ENABLED = os.getenv("DB_ASYNC_ENABLED", "1") == "1"
+
+def apply_sqlite_profile(engine, profile: Dict[str, Any]):
+    """Run the profile's PRAGMAs on every new connection of a (sync) engine"""
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in profile.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+
+def _sqlite_connect_args(profile: Dict[str, Any]) -> Dict[str, Any]:
+    return {"check_same_thread": False, "timeout": profile.get("busy_timeout", 5000) / 1000}
+
 # =============================================================================
 # DATABASE MODELS
 # =============================================================================
@@ -29,6 +70,10 @@ class Conversation(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = Column(Boolean, default=True)
     
+    __table_args__ = (
+        Index("ix_conversations_active_updated", "is_active", "updated_at"),
+    )
+    
     # Relationships
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
     workflows = relationship("Workflow", back_populates="conversation", cascade="all, delete-orphan")
@@ -47,6 +92,10 @@ class Message(Base):
     retry_count = Column(Integer, default=0)
     parent_message_id = Column(String, nullable=True)
     
+    __table_args__ = (
+        Index("ix_messages_conversation_timestamp", "conversation_id", "timestamp"),
+    )
+    
     # Relationships
     conversation = relationship("Conversation", back_populates="messages")
 
@@ -75,17 +124,60 @@ class AgentMemory(Base):
     content = Column(JSON, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_agent_memories_lookup", "conversation_id", "agent_id", "memory_type"),
+    )
 
 # =============================================================================
 # DATABASE SERVICE
 # =============================================================================
 
+def _conversation_listing(limit: int):
+    """Active conversations with message counts in a single query.
+    The correlated COUNT(*) only runs for rows kept by LIMIT and is answered
+    from ix_messages_conversation_timestamp, so listing stays O(limit)."""
+    message_count = (
+        select(func.count())
+        .select_from(Message)
+        .where(Message.conversation_id == Conversation.id)
+        .correlate(Conversation)
+        .scalar_subquery()
+    )
+    return select(Conversation, message_count.label("message_count")).where(
+        Conversation.is_active == True
+    ).order_by(Conversation.updated_at.desc()).limit(limit)
+
+def _conversation_dicts(rows) -> List[Dict[str, Any]]:
+    return [
+        {
+            'id': conv.id,
+            'title': conv.title,
+            'created_at': conv.created_at,
+            'updated_at': conv.updated_at,
+            'is_active': conv.is_active,
+            'message_count': count or 0
+        }
+        for conv, count in rows
+    ]
+
 class DatabaseService:
-    def __init__(self, db_url: str = "sqlite:///./agent_system.db"):
-        self.engine = create_engine(db_url, echo=False)
+    def __init__(self, db_url: str = "sqlite:///./agent_system.db", profile: Dict[str, Any] = SQLITE_PROFILE):
+        if db_url.startswith("sqlite"):
+            self.engine = create_engine(db_url, echo=False, connect_args=_sqlite_connect_args(profile))
+            apply_sqlite_profile(self.engine, profile)
+        else:
+            self.engine = create_engine(db_url, echo=False)
         Base.metadata.create_all(self.engine)
+        self._ensure_indexes()
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
     
+    def _ensure_indexes(self):
+        """create_all skips indexes on tables that already exist, so add them to older databases"""
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=self.engine, checkfirst=True)
+    
     def get_session(self):
         return self.SessionLocal()
     
@@ -98,29 +190,10 @@ class DatabaseService:
             session.refresh(conversation)
             return conversation
     
-    def get_conversations(self, limit: int = 50) -> List[Conversation]:
+    def get_conversations(self, limit: int = 50) -> List[Dict[str, Any]]:
         with self.get_session() as session:
-            conversations = session.query(Conversation).filter(
-                Conversation.is_active == True
-            ).order_by(Conversation.updated_at.desc()).limit(limit).all()
-            
             # Convert to dictionaries to avoid session issues
-            result = []
-            for conv in conversations:
-                # Get message count
-                message_count = session.query(Message).filter(
-                    Message.conversation_id == conv.id
-                ).count()
-                
-                result.append({
-                    'id': conv.id,
-                    'title': conv.title,
-                    'created_at': conv.created_at,
-                    'updated_at': conv.updated_at,
-                    'is_active': conv.is_active,
-                    'message_count': message_count
-                })
-            return result
+            return _conversation_dicts(session.execute(_conversation_listing(limit)).all())
     
     def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
         with self.get_session() as session:
@@ -140,24 +213,37 @@ class DatabaseService:
             return False
     
     # Message Management
+    @staticmethod
+    def _message_row(conversation_id: str, message_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": message_data.get("id") or str(uuid.uuid4()),
+            "conversation_id": conversation_id,
+            "from_agent": message_data["from_agent"],
+            "to_agent": message_data["to_agent"],
+            "message_type": message_data["message_type"],
+            "content": message_data["content"],
+            "message_metadata": message_data.get("metadata", {}),
+            "timestamp": message_data.get("timestamp", datetime.utcnow()),
+            "retry_count": message_data.get("retry_count", 0),
+            "parent_message_id": message_data.get("parent_message_id")
+        }
+    
     def save_message(self, conversation_id: str, message_data: Dict[str, Any]) -> Message:
         with self.get_session() as session:
-            message = Message(
-                conversation_id=conversation_id,
-                from_agent=message_data["from_agent"],
-                to_agent=message_data["to_agent"],
-                message_type=message_data["message_type"],
-                content=message_data["content"],
-                message_metadata=message_data.get("metadata", {}),
-                timestamp=message_data.get("timestamp", datetime.utcnow()),
-                retry_count=message_data.get("retry_count", 0),
-                parent_message_id=message_data.get("parent_message_id")
-            )
+            message = Message(**self._message_row(conversation_id, message_data))
             session.add(message)
             session.commit()
             session.refresh(message)
             return message
     
+    def save_messages(self, batch: List[tuple]) -> int:
+        """Bulk insert (conversation_id, message_data) pairs in a single transaction"""
+        rows = [self._message_row(conversation_id, message_data) for conversation_id, message_data in batch]
+        with self.get_session() as session:
+            session.bulk_insert_mappings(Message, rows)
+            session.commit()
+        return len(rows)
+    
     def get_conversation_messages(self, conversation_id: str, limit: int = 100) -> List[Message]:
         with self.get_session() as session:
             return session.query(Message).filter(
@@ -202,6 +288,150 @@ class DatabaseService:
                 AgentMemory.memory_type == memory_type
             ).first()
 
+# =============================================================================
+# ASYNC DATABASE SERVICE (aiosqlite)
+# =============================================================================
+
+class AsyncDatabaseService:
+    """AsyncSession variant of DatabaseService so async endpoints never block on SQLite"""
+    
+    def __init__(self, db_url: str = "sqlite+aiosqlite:///./agent_system.db", profile: Dict[str, Any] = SQLITE_PROFILE):
+        if not ASYNC_DB_AVAILABLE:
+            raise ImportError("Async database support not available. Install with: pip install aiosqlite")
+        self.engine = create_async_engine(db_url, echo=False, connect_args={"timeout": profile.get("busy_timeout", 5000) / 1000})
+        apply_sqlite_profile(self.engine.sync_engine, profile)
+        self.SessionLocal = async_sessionmaker(self.engine, expire_on_commit=False)
+    
+    async def init_models(self):
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    
+    async def create_conversation(self, title: str) -> Conversation:
+        async with self.SessionLocal() as session:
+            conversation = Conversation(title=title)
+            session.add(conversation)
+            await session.commit()
+            return conversation
+    
+    async def get_conversations(self, limit: int = 50) -> List[Dict[str, Any]]:
+        async with self.SessionLocal() as session:
+            result = await session.execute(_conversation_listing(limit))
+            return _conversation_dicts(result.all())
+    
+    async def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        async with self.SessionLocal() as session:
+            return await session.get(Conversation, conversation_id)
+    
+    async def delete_conversation(self, conversation_id: str) -> bool:
+        async with self.SessionLocal() as session:
+            conversation = await session.get(Conversation, conversation_id)
+            if conversation:
+                conversation.is_active = False
+                await session.commit()
+                return True
+            return False
+    
+    async def save_messages(self, batch: List[tuple]) -> int:
+        rows = [DatabaseService._message_row(conversation_id, message_data) for conversation_id, message_data in batch]
+        async with self.SessionLocal() as session:
+            await session.run_sync(lambda sync_session: sync_session.bulk_insert_mappings(Message, rows))
+            await session.commit()
+        return len(rows)
+    
+    async def get_conversation_messages(self, conversation_id: str, limit: int = 100) -> List[Message]:
+        async with self.SessionLocal() as session:
+            result = await session.execute(
+                select(Message).where(Message.conversation_id == conversation_id)
+                .order_by(Message.timestamp.asc()).limit(limit)
+            )
+            return list(result.scalars().all())
+    
+    async def dispose(self):
+        await self.engine.dispose()
+
+# =============================================================================
+# WRITE-BEHIND MESSAGE QUEUE
+# =============================================================================
+
+DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "50"))
+DB_WRITE_FLUSH_INTERVAL = float(os.getenv("DB_WRITE_FLUSH_INTERVAL", "0.5"))
+DB_WRITE_MAX_PENDING = int(os.getenv("DB_WRITE_MAX_PENDING", "1000"))
+
+class MessageWriteBehind:
+    """
+    SAFE: Buffers messages and persists them in batches off the request path
+    Enqueueing only waits when the buffer is full (backpressure); close() flushes
+    """
+    
+    def __init__(self, db_service: 'DatabaseService', batch_size: int = DB_WRITE_BATCH_SIZE,
+                 flush_interval: float = DB_WRITE_FLUSH_INTERVAL, max_pending: int = DB_WRITE_MAX_PENDING):
+        self.db_service = db_service
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+    
+    def _ensure_worker(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+    
+    async def enqueue(self, conversation_id: str, message_data: Dict[str, Any]):
+        """Queue a message for persistence; waits only when the buffer is full"""
+        self._ensure_worker()
+        await self._queue.put((conversation_id, message_data))
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(remaining, 0.05))
+            
+            try:
+                await asyncio.to_thread(self.db_service.save_messages, batch)
+                self.written += len(batch)
+                self.batches += 1
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"⚠️ Database logging failed (non-critical): {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    async def flush(self):
+        """Wait until everything queued so far has been written"""
+        if self._queue is not None and self._worker is not None and not self._worker.done():
+            await self._queue.join()
+    
+    async def close(self):
+        await self.flush()
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "batches": self.batches,
+            "failed": self.failed
+        }
+
 # =============================================================================
 # CONVERSATION LOGGER (SAFE INTEGRATION)
 # =============================================================================
@@ -212,28 +442,29 @@ class ConversationLogger:
     It just logs what's happening for later retrieval
     """
     
-    def __init__(self, db_service: DatabaseService):
+    def __init__(self, db_service: DatabaseService, writer: Optional[MessageWriteBehind] = None):
         self.db_service = db_service
+        self.writer = writer or MessageWriteBehind(db_service)
         self.current_conversation_id: Optional[str] = None
     
     async def start_conversation(self, title: str) -> str:
         """Start a new conversation - doesn't affect agent communication"""
-        conversation = self.db_service.create_conversation(title)
+        conversation = await asyncio.to_thread(self.db_service.create_conversation, title)
         self.current_conversation_id = conversation.id
         return conversation.id
     
     async def log_message(self, message):
-        """Log a message to database - doesn't affect agent processing"""
+        """Queue a message for batched logging - doesn't affect agent processing"""
         if self.current_conversation_id:
             try:
-                self.db_service.save_message(
+                await self.writer.enqueue(
                     self.current_conversation_id, 
                     {
                         "from_agent": message.from_agent,
                         "to_agent": message.to_agent,
                         "message_type": message.message_type.value,
                         "content": message.content,
-                        "metadata": message.metadata,
+                        "metadata": dict(message.metadata),
                         "timestamp": message.timestamp,
                         "retry_count": message.retry_count,
                         "parent_message_id": message.parent_message_id
@@ -264,9 +495,16 @@ class SafeDatabaseIntegration:
     SAFE: This class provides database functionality without breaking existing flow
     """
     
-    def __init__(self, db_url: str = "sqlite:///./agent_system.db"):
-        self.db_service = DatabaseService(db_url)
-        self.logger = ConversationLogger(self.db_service)
+    def __init__(self, db_url: str = "sqlite:///./agent_system.db", profile: Dict[str, Any] = SQLITE_PROFILE):
+        self.db_service = DatabaseService(db_url, profile)
+        self.async_db_service: Optional[AsyncDatabaseService] = None
+        if DB_ASYNC_ENABLED and not ASYNC_DB_AVAILABLE:
+            print(f"⚠️ Async database path disabled ({ASYNC_DB_IMPORT_ERROR}); "
+                  "reads run sync sessions in a thread. Install with: pip install 'sqlalchemy[asyncio]' aiosqlite")
+        if DB_ASYNC_ENABLED and ASYNC_DB_AVAILABLE and db_url.startswith("sqlite:///"):
+            self.async_db_service = AsyncDatabaseService(db_url.replace("sqlite:///", "sqlite+aiosqlite:///", 1), profile)
+        self.writer = MessageWriteBehind(self.db_service)
+        self.logger = ConversationLogger(self.db_service, self.writer)
         self.enabled = True  # Can be disabled if needed
     
     def attach_to_message_bus(self, message_bus, conversation_id: Optional[str] = None):
@@ -284,21 +522,34 @@ class SafeDatabaseIntegration:
     async def get_conversations(self):
         """Get conversation history - read-only operation"""
         if self.enabled:
-            return self.db_service.get_conversations()
+            if self.async_db_service:
+                return await self.async_db_service.get_conversations()
+            return await asyncio.to_thread(self.db_service.get_conversations)
         return []
     
     async def get_conversation(self, conversation_id: str):
         """Get specific conversation - read-only"""
         if self.enabled:
-            return self.db_service.get_conversation(conversation_id)
+            if self.async_db_service:
+                return await self.async_db_service.get_conversation(conversation_id)
+            return await asyncio.to_thread(self.db_service.get_conversation, conversation_id)
         return None
     
+    async def get_conversation_messages(self, conversation_id: str, limit: int = 100):
+        """Get messages of a conversation - read-only"""
+        if self.enabled:
+            if self.async_db_service:
+                return await self.async_db_service.get_conversation_messages(conversation_id, limit)
+            return await asyncio.to_thread(self.db_service.get_conversation_messages, conversation_id, limit)
+        return []
+    
     async def add_message_to_conversation(self, conversation_id: str, from_agent: str, 
                                         to_agent: str, message_type: str, content: str, 
                                         metadata: Dict[str, Any] = None):
-        """Add message to conversation"""
+        """Queue a message for the conversation and return its id (written in the background)"""
         if self.enabled:
             message_data = {
+                "id": str(uuid.uuid4()),
                 "from_agent": from_agent,
                 "to_agent": to_agent,
                 "message_type": message_type,
@@ -306,13 +557,26 @@ class SafeDatabaseIntegration:
                 "metadata": metadata or {},
                 "timestamp": datetime.utcnow()
             }
-            return self.db_service.save_message(conversation_id, message_data)
+            await self.writer.enqueue(conversation_id, message_data)
+            return message_data["id"]
         return None
     
+    async def flush(self):
+        """Persist every queued message (read-your-writes before querying messages)"""
+        await self.writer.flush()
+    
+    async def close(self):
+        """Flush pending writes and release connections on shutdown"""
+        await self.writer.close()
+        if self.async_db_service:
+            await self.async_db_service.dispose()
+    
     async def delete_conversation(self, conversation_id: str):
         """Delete conversation - doesn't affect current agents"""
         if self.enabled:
-            return self.db_service.delete_conversation(conversation_id)
+            if self.async_db_service:
+                return await self.async_db_service.delete_conversation(conversation_id)
+            return await asyncio.to_thread(self.db_service.delete_conversation, conversation_id)
         return False
     
     def disable(self):
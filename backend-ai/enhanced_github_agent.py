@@ -8,8 +8,9 @@ from enhanced_github_service import EnhancedGitHubService, EnhancedGitHubConfig
 logger = logging.getLogger(__name__)
 
 class EnhancedGitHubAgent:
-    def __init__(self, generated_dir: Path):
+    def __init__(self, generated_dir: Path, catalog=None):
         self.generated_dir = generated_dir
+        self.catalog = catalog  # Optional ArtifactStore: sizes come from its index instead of file reads
         self.service = None
         self._initialize_service()
     
@@ -21,14 +22,14 @@ class EnhancedGitHubAgent:
                     username=os.getenv('GITHUB_USERNAME'),
                     email=os.getenv('GITHUB_EMAIL', '')
                 )
-                self.service = EnhancedGitHubService(config, self.generated_dir)
+                self.service = EnhancedGitHubService(config, self.generated_dir, self.catalog)
             except Exception as e:
                 logger.warning(f"GitHub service init failed: {e}")
     
     def configure_github(self, token: str, username: str, email: str = "") -> Dict[str, Any]:
         try:
             config = EnhancedGitHubConfig(token=token, username=username, email=email)
-            self.service = EnhancedGitHubService(config, self.generated_dir)
+            self.service = EnhancedGitHubService(config, self.generated_dir, self.catalog)
             return self.service.validate_and_get_user_info()
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -56,4 +57,8 @@ class EnhancedGitHubAgent:
     
     def preview_extractable_code(self) -> Dict[str, Any]:
         if not self.service:
-            return {"success": False, "error": "GitHub not configured"}
\ No newline at end of file
+            return {"success": False, "error": "GitHub not configured"}
+        try:
+            return self.service.preview_generated_code()
+        except Exception as e:
+            return {"success": False, "error": str(e)}
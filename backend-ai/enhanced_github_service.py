@@ -25,9 +25,10 @@ class EnhancedCodeFile(BaseModel):
     size: int
 
 class EnhancedGitHubService:
-    def __init__(self, config: EnhancedGitHubConfig, generated_dir: Path):
+    def __init__(self, config: EnhancedGitHubConfig, generated_dir: Path, catalog=None):
         self.config = config
         self.generated_dir = generated_dir
+        self.catalog = catalog
         self.base_url = "https://api.github.com"
         self.headers = {
             "Authorization": f"token {config.token}",
@@ -45,23 +46,56 @@ class EnhancedGitHubService:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    def _catalog_files(self) -> Optional[List[Dict[str, Any]]]:
+        """Names and sizes from the artifact catalog; the directory is only scanned when there is no catalog"""
+        if self.catalog is not None:
+            return [{"path": a["filename"], "size": a["size"]} for a in self.catalog.list()]
+        if not self.generated_dir.exists():
+            return None
+        return [{"path": p.name, "size": p.stat().st_size} for p in self.generated_dir.glob("*.py")]
+    
+    def _read_generated(self, filename: str) -> Optional[str]:
+        path = self.catalog.path_for(filename) if self.catalog is not None else self.generated_dir / filename
+        if path is None:
+            return None
+        try:
+            return path.read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError):
+            return None
+    
+    def preview_generated_code(self) -> Dict[str, Any]:
+        """File names and sizes from the artifact catalog, without reading file contents"""
+        files_preview = self._catalog_files()
+        if files_preview is None:
+            return {"success": False, "error": "Generated directory does not exist"}
+        
+        return {
+            "success": True,
+            "files_preview": files_preview,
+            "stats": {
+                "total_files": len(files_preview),
+                "total_size": sum(f["size"] for f in files_preview)
+            }
+        }
+    
     def extract_and_organize_generated_code(self) -> Dict[str, Any]:
         try:
-            if not self.generated_dir.exists():
+            catalog_files = self._catalog_files()
+            if catalog_files is None:
                 return {"success": False, "error": "Generated directory does not exist"}
             
+            # Only the files being pushed are read; names and sizes come from the catalog
             files = []
-            for file_path in self.generated_dir.glob("*.py"):
-                try:
-                    content = file_path.read_text(encoding='utf-8')
-                    files.append(EnhancedCodeFile(
-                        path=file_path.name,
-                        content=content, 
-                        language='python',
-                        size=len(content)
-                    ))
-                except:
+            for entry in catalog_files:
+                content = self._read_generated(entry["path"])
+                if content is None:
                     continue
+                files.append(EnhancedCodeFile(
+                    path=entry["path"],
+                    content=content,
+                    language='python',
+                    size=entry["size"]
+                ))
             
             if not files:
                 return {"success": False, "error": "No Python files found"}
@@ -0,0 +1,130 @@
+"""
+Execution graphs for multi-agent flows
+Compiles agents + directed edges into a validated plan and runs it so every
+node starts as soon as all of its predecessors have finished
+"""
+
+import asyncio
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class FlowGraphError(ValueError):
+    """Raised for edges to unknown nodes or cyclic graphs"""
+
+
+class FlowPlan:
+    """Topologically ordered execution plan for a directed acyclic flow"""
+
+    def __init__(self, order: List[str], predecessors: Dict[str, List[str]], successors: Dict[str, List[str]]):
+        self.order = order
+        self.predecessors = predecessors
+        self.successors = successors
+        self.entry_nodes = [node for node in order if not predecessors[node]]
+        self.exit_nodes = [node for node in order if not successors[node]]
+        self.levels = self._compute_levels()
+
+    def _compute_levels(self) -> List[List[str]]:
+        depth: Dict[str, int] = {}
+        for node in self.order:
+            depth[node] = max((depth[pred] + 1 for pred in self.predecessors[node]), default=0)
+        levels: List[List[str]] = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+        for node in self.order:
+            levels[depth[node]].append(node)
+        return levels
+
+    @property
+    def critical_path_length(self) -> int:
+        return len(self.levels)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "order": self.order,
+            "levels": self.levels,
+            "entry_nodes": self.entry_nodes,
+            "exit_nodes": self.exit_nodes,
+            "edges": [(node, succ) for node in self.order for succ in self.successors[node]]
+        }
+
+
+def compile_flow(nodes: Iterable[str], edges: Iterable[Tuple[str, str]]) -> FlowPlan:
+    """Validate the graph and order it with Kahn's algorithm (stable w.r.t. node order)"""
+    node_list = list(dict.fromkeys(nodes))
+    known = set(node_list)
+    predecessors: Dict[str, List[str]] = {node: [] for node in node_list}
+    successors: Dict[str, List[str]] = {node: [] for node in node_list}
+
+    for source, target in edges:
+        if source not in known or target not in known:
+            missing = source if source not in known else target
+            raise FlowGraphError(f"Connection references unknown agent '{missing}'")
+        if target not in successors[source]:
+            successors[source].append(target)
+            predecessors[target].append(source)
+
+    indegree = {node: len(predecessors[node]) for node in node_list}
+    ready = [node for node in node_list if indegree[node] == 0]
+    order: List[str] = []
+    while ready:
+        node = ready.pop(0)
+        order.append(node)
+        for succ in successors[node]:
+            indegree[succ] -= 1
+            if indegree[succ] == 0:
+                ready.append(succ)
+
+    if len(order) != len(node_list):
+        cyclic = [node for node in node_list if indegree[node] > 0]
+        raise FlowGraphError(f"Connections form a cycle between: {', '.join(cyclic)}")
+
+    return FlowPlan(order, predecessors, successors)
+
+
+@lru_cache(maxsize=128)
+def _compile_frozen(nodes: Tuple[str, ...], edges: Tuple[Tuple[str, str], ...]) -> FlowPlan:
+    return compile_flow(nodes, edges)
+
+
+def compile_flow_cached(nodes: Iterable[str], edges: Iterable[Tuple[str, str]]) -> FlowPlan:
+    """compile_flow memoized on the exact canvas, so re-running a flow skips planning.
+
+    The returned plan is shared between callers and must not be mutated.
+    """
+    return _compile_frozen(tuple(nodes), tuple((source, target) for source, target in edges))
+
+
+def plan_cache_stats() -> Dict[str, int]:
+    info = _compile_frozen.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+
+
+async def execute_flow(plan: FlowPlan,
+                       run_node: Callable[[str, Dict[str, Any]], Awaitable[Any]],
+                       limiter: Optional[Callable[[str], Optional[asyncio.Semaphore]]] = None) -> Dict[str, Any]:
+    """Run every node once its predecessors are done, independent branches concurrently.
+
+    run_node receives the node id and a {predecessor: result} mapping; limiter
+    may return a semaphore bounding how many nodes of a kind run at once.
+    """
+    tasks: Dict[str, asyncio.Future] = {}
+
+    async def run(node: str) -> Any:
+        preds = plan.predecessors[node]
+        results = await asyncio.gather(*(tasks[pred] for pred in preds))
+        inputs = dict(zip(preds, results))
+        semaphore = limiter(node) if limiter else None
+        if semaphore is None:
+            return await run_node(node, inputs)
+        async with semaphore:
+            return await run_node(node, inputs)
+
+    for node in plan.order:
+        tasks[node] = asyncio.ensure_future(run(node))
+
+    try:
+        results = await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+    return dict(zip(tasks.keys(), results))
@@ -0,0 +1,219 @@
+"""
+Admission control and scheduling for local Ollama generations
+Every generation asks the scheduler for a slot. Slots are capped per model
+and in total (on CPU-only hosts one model at a time avoids reload thrash).
+Waiting requests are served short prompts first, then round-robin across
+conversations so one busy conversation can't starve the rest. When a
+model's queue is full, new work is rejected at once with a Retry-After
+estimate instead of piling up behind it.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+
+PRIORITY_SHORT = 0
+PRIORITY_NORMAL = 1
+PRIORITY_NAMES = {PRIORITY_SHORT: "short", PRIORITY_NORMAL: "normal"}
+
+# Weight of the newest sample in the moving averages behind Retry-After
+EWMA_ALPHA = 0.3
+
+
+class SchedulerOverloaded(Exception):
+    """Raised when a model's queue is full; retry_after is a whole number of seconds"""
+
+    def __init__(self, model: str, queued: int, retry_after: int):
+        super().__init__(f"Model '{model}' is overloaded ({queued} requests queued), retry in {retry_after}s")
+        self.model = model
+        self.queued = queued
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("future", "tenant", "priority", "seq", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, tenant: str, priority: int, seq: int):
+        self.future = future
+        self.tenant = tenant
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+
+
+class _ModelQueue:
+    """Running count plus per-priority, per-tenant FIFOs for one model"""
+
+    def __init__(self):
+        self.running = 0
+        self.queued = 0
+        self.waiting: Dict[int, "OrderedDict[str, Deque[_Waiter]]"] = {
+            priority: OrderedDict() for priority in PRIORITY_NAMES
+        }
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.avg_wait = 0.0
+        self.avg_service: Optional[float] = None
+
+    def head(self) -> Optional[_Waiter]:
+        """Next waiter: best priority class, then the tenant at the front of the rotation"""
+        for priority in sorted(self.waiting):
+            tenants = self.waiting[priority]
+            if tenants:
+                return next(iter(tenants.values()))[0]
+        return None
+
+    def pop(self, waiter: _Waiter):
+        tenants = self.waiting[waiter.priority]
+        queue = tenants.pop(waiter.tenant)
+        queue.popleft()
+        if queue:
+            # Re-append so the other tenants go first next time
+            tenants[waiter.tenant] = queue
+        self.queued -= 1
+
+    def remove(self, waiter: _Waiter):
+        tenants = self.waiting[waiter.priority]
+        queue = tenants.get(waiter.tenant)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del tenants[waiter.tenant]
+        self.queued -= 1
+
+
+class InferenceScheduler:
+    """Per-model concurrency caps with fair, priority-aware queueing and load shedding"""
+
+    def __init__(self, max_concurrency_per_model: int = 2, max_total_concurrency: int = 0,
+                 max_queue_depth: int = 16, default_service_time: float = 10.0):
+        self.max_concurrency_per_model = max(1, max_concurrency_per_model)
+        self.max_total_concurrency = max_total_concurrency  # 0 = only the per-model caps apply
+        self.max_queue_depth = max_queue_depth  # 0 = unbounded
+        self.default_service_time = default_service_time
+        self._models: Dict[str, _ModelQueue] = {}
+        self._seq = 0
+        self._last_model: Optional[str] = None
+
+    def _model(self, model: str) -> _ModelQueue:
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = _ModelQueue()
+        return state
+
+    @property
+    def running(self) -> int:
+        return sum(state.running for state in self._models.values())
+
+    def _has_capacity(self, state: _ModelQueue) -> bool:
+        if state.running >= self.max_concurrency_per_model:
+            return False
+        return not self.max_total_concurrency or self.running < self.max_total_concurrency
+
+    def retry_after(self, model: str) -> int:
+        """Seconds until the current backlog for this model should have drained"""
+        state = self._model(model)
+        service = state.avg_service or self.default_service_time
+        backlog = state.queued + state.running
+        return max(1, min(300, math.ceil(service * backlog / self.max_concurrency_per_model)))
+
+    def check_admission(self, model: str):
+        """Raise SchedulerOverloaded if this model's queue is full"""
+        state = self._model(model)
+        if self.max_queue_depth and state.queued >= self.max_queue_depth:
+            state.rejected += 1
+            raise SchedulerOverloaded(model, state.queued, self.retry_after(model))
+
+    @asynccontextmanager
+    async def slot(self, model: str, tenant: str = "default", priority: int = PRIORITY_NORMAL):
+        """Hold one generation slot for `model`; waits its turn or raises SchedulerOverloaded"""
+        state = self._model(model)
+        self.check_admission(model)
+
+        if state.queued == 0 and self._has_capacity(state):
+            state.running += 1
+            self._last_model = model
+        else:
+            self._seq += 1
+            waiter = _Waiter(asyncio.get_running_loop().create_future(), tenant, priority, self._seq)
+            state.waiting[priority].setdefault(tenant, deque()).append(waiter)
+            state.queued += 1
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    # Granted just as we were cancelled: hand the slot straight on
+                    self._release(model, None)
+                else:
+                    state.remove(waiter)
+                raise
+
+        state.admitted += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(model, time.monotonic() - started)
+
+    def _release(self, model: str, service_time: Optional[float]):
+        state = self._models[model]
+        state.running -= 1
+        if service_time is not None:
+            state.completed += 1
+            state.avg_service = service_time if state.avg_service is None else (
+                EWMA_ALPHA * service_time + (1 - EWMA_ALPHA) * state.avg_service
+            )
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant freed slots: short prompts first, then the model already loaded, then the oldest request"""
+        while True:
+            best_name, best_waiter, best_rank = None, None, None
+            for name, state in self._models.items():
+                waiter = state.head()
+                if waiter is None or not self._has_capacity(state):
+                    continue
+                rank = (waiter.priority, name != self._last_model, waiter.seq)
+                if best_rank is None or rank < best_rank:
+                    best_name, best_waiter, best_rank = name, waiter, rank
+            if best_waiter is None:
+                return
+
+            state = self._models[best_name]
+            state.pop(best_waiter)
+            state.running += 1
+            waited = time.monotonic() - best_waiter.enqueued_at
+            state.avg_wait = EWMA_ALPHA * waited + (1 - EWMA_ALPHA) * state.avg_wait
+            self._last_model = best_name
+            best_waiter.future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        models = {}
+        for name, state in self._models.items():
+            models[name] = {
+                "running": state.running,
+                "queued": state.queued,
+                "queued_by_priority": {
+                    PRIORITY_NAMES[priority]: sum(len(queue) for queue in tenants.values())
+                    for priority, tenants in state.waiting.items()
+                },
+                "waiting_conversations": len({tenant for tenants in state.waiting.values() for tenant in tenants}),
+                "admitted": state.admitted,
+                "rejected": state.rejected,
+                "completed": state.completed,
+                "avg_wait": round(state.avg_wait, 3),
+                "avg_service_time": round(state.avg_service, 3) if state.avg_service is not None else None
+            }
+        return {
+            "max_concurrency_per_model": self.max_concurrency_per_model,
+            "max_total_concurrency": self.max_total_concurrency,
+            "max_queue_depth": self.max_queue_depth,
+            "running": self.running,
+            "queued": sum(state.queued for state in self._models.values()),
+            "models": models
+        }
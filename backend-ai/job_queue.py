@@ -0,0 +1,157 @@
+"""
+In-process background job queue
+Long workflow runs are submitted as jobs and executed by a fixed number of
+asyncio workers, so the HTTP request returns a job id immediately and clients
+poll for status and results. Cancelling a running job cancels its task, which
+propagates into whatever the workflow is awaiting (LLM calls, test runs).
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+JOB_STATES = ("queued", "running", "completed", "failed", "cancelled")
+FINISHED_STATES = ("completed", "failed", "cancelled")
+
+
+class Job:
+    """One submitted unit of work and its outcome"""
+
+    def __init__(self, job_id: str, kind: str, run: Callable[[], Awaitable[Any]],
+                 metadata: Optional[Dict[str, Any]] = None):
+        self.job_id = job_id
+        self.kind = kind
+        self.run = run
+        self.metadata = metadata or {}
+        self.status = "queued"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_requested = False
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "error": self.error,
+            "metadata": self.metadata,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_time": round((self.started_at or time.time()) - self.submitted_at, 3),
+            "run_time": round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else None
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class JobQueue:
+    """FIFO of jobs drained by `concurrency` workers; keeps the last `max_jobs` jobs for polling"""
+
+    def __init__(self, concurrency: int = 2, max_jobs: int = 1000):
+        self.concurrency = max(1, concurrency)
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    def _ensure_workers(self):
+        # Workers start lazily so the queue can be created at import time, before the event loop exists
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    def submit(self, kind: str, run: Callable[[], Awaitable[Any]], job_id: Optional[str] = None,
+               metadata: Optional[Dict[str, Any]] = None) -> Job:
+        """Queue a coroutine factory; returns at once with the job to poll"""
+        job_id = job_id or f"job_{time.time()}"
+        existing = self._jobs.get(job_id)
+        if existing is not None and not existing.finished:
+            raise ValueError(f"Job {job_id} is already {existing.status}")
+
+        self._ensure_workers()
+        job = Job(job_id, kind, run, metadata)
+        self._jobs.pop(job_id, None)
+        self._jobs[job_id] = job
+        self._evict()
+        self._queue.put_nowait(job)
+        return job
+
+    def _evict(self):
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:excess]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        """Most recently submitted first"""
+        return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; False if unknown or already finished"""
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel_requested = True
+        if job.status == "queued":
+            # The worker skips it when it reaches the front of the queue
+            job.status = "cancelled"
+            job.finished_at = time.time()
+        elif job.task is not None:
+            job.task.cancel()
+        return True
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status != "queued":
+                    continue
+                job.status = "running"
+                job.started_at = time.time()
+                job.task = asyncio.create_task(job.run())
+                try:
+                    job.result = await job.task
+                    job.status = "completed"
+                except asyncio.CancelledError:
+                    job.status = "cancelled"
+                    if not job.cancel_requested:
+                        raise
+                except Exception as e:
+                    job.status = "failed"
+                    job.error = str(e)
+                finally:
+                    job.finished_at = time.time()
+            finally:
+                self._queue.task_done()
+
+    async def shutdown(self):
+        """Cancel running jobs and stop the workers"""
+        for job in self._jobs.values():
+            if not job.finished:
+                self.cancel(job.job_id)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {state: 0 for state in JOB_STATES}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {"concurrency": self.concurrency, "jobs": len(self._jobs), **counts}
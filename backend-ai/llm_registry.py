@@ -0,0 +1,52 @@
+"""
+Process-wide registry of warm OllamaLLM clients
+Agents share one client per (model, config) so HTTP connections to the
+Ollama server are reused instead of rebuilt for every agent and request
+"""
+
+import json
+import threading
+from typing import Dict, Any, Tuple
+
+from langchain_ollama import OllamaLLM
+
+
+class OllamaClientRegistry:
+    """Thread-safe pool of OllamaLLM clients keyed by model + config"""
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, str], OllamaLLM] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _make_key(model_name: str, config: Dict[str, Any]) -> Tuple[str, str]:
+        return model_name, json.dumps(config, sort_keys=True, default=str)
+
+    def get(self, model_name: str, config: Dict[str, Any]) -> OllamaLLM:
+        """Return the shared client for this model/config, creating it on first use"""
+        key = self._make_key(model_name, config)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self.hits += 1
+                return client
+            self.misses += 1
+            client = OllamaLLM(model=model_name, **config)
+            self._clients[key] = client
+            return client
+
+    def clear(self):
+        """Drop all pooled clients (e.g. after a model or GPU config change)"""
+        with self._lock:
+            self._clients.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "live_instances": len(self._clients),
+                "models": sorted({model for model, _ in self._clients})
+            }
@@ -5,26 +5,45 @@ import os
 from pathlib import Path
 import re
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Callable
-import tempfile
+from email.utils import formatdate, parsedate_to_datetime
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Tuple
+import time
 import subprocess
-import sys
 import logging
 import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
 import json
 from enum import Enum
 import ast
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, PlainTextResponse, RedirectResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
-from langchain_ollama import OllamaLLM
 import uvicorn
 
+# Shared Ollama client pool
+from llm_registry import OllamaClientRegistry
+
+# Admission control and fair scheduling of Ollama generations
+from inference_scheduler import PRIORITY_NORMAL, PRIORITY_SHORT, InferenceScheduler, SchedulerOverloaded
+
+# Prompt -> completion cache
+from completion_cache import CompletionCache
+
+# Warm test runner pool
+from runner_pool import RunnerPool, TestResultCache, format_test_report
+from planner import IncrementalPlanParser, PLAN_JSON_SCHEMA, TaskPlanner
+from workflow_runs import WorkflowRun, WorkflowRunStore
+from job_queue import JobQueue
+from artifact_store import ArtifactStore
+from flow_graph import compile_flow_cached, execute_flow, plan_cache_stats
+
 # Database integration
 from database import SafeDatabaseIntegration, ConversationRequest, ConversationResponse, ChatRequestWithConversation
 
@@ -110,6 +129,44 @@ MODEL_CONFIGS = {
     }
 }
 
+# Blocking work (Ollama generations, GitHub HTTP calls) runs on this bounded
+# pool so agents never stall the event loop serving /health, /ws and /chat.
+LLM_WORKER_THREADS = int(os.getenv("LLM_WORKER_THREADS", "8"))
+llm_executor = ThreadPoolExecutor(max_workers=LLM_WORKER_THREADS, thread_name_prefix="llm-worker")
+
+# Streamed generations are forwarded to /ws in chunks of roughly this many
+# characters (or every STREAM_FLUSH_INTERVAL seconds); the first token goes out immediately
+STREAM_CHUNK_CHARS = int(os.getenv("STREAM_CHUNK_CHARS", "64"))
+STREAM_FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_INTERVAL", "0.1"))
+
+# Warm OllamaLLM clients shared by every agent
+ollama_clients = OllamaClientRegistry()
+
+# Every generation takes a scheduler slot. CPU-only hosts default to one generation
+# (and so one loaded model) at a time; prompts under SCHEDULER_SHORT_PROMPT_CHARS jump
+# the queue, and a full per-model queue answers 429 with Retry-After.
+CPU_ONLY = DEFAULT_GPU_CONFIG["num_gpu"] == 0
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "1" if CPU_ONLY else "2"))
+OLLAMA_MAX_TOTAL_CONCURRENCY = int(os.getenv("OLLAMA_MAX_TOTAL_CONCURRENCY", "1" if CPU_ONLY else "0"))
+SCHEDULER_MAX_QUEUE_DEPTH = int(os.getenv("SCHEDULER_MAX_QUEUE_DEPTH", "8" if CPU_ONLY else "16"))
+SCHEDULER_SHORT_PROMPT_CHARS = int(os.getenv("SCHEDULER_SHORT_PROMPT_CHARS", "2000"))
+inference_scheduler = InferenceScheduler(
+    max_concurrency_per_model=OLLAMA_MAX_CONCURRENCY,
+    max_total_concurrency=OLLAMA_MAX_TOTAL_CONCURRENCY,
+    max_queue_depth=SCHEDULER_MAX_QUEUE_DEPTH,
+    default_service_time=float(os.getenv("SCHEDULER_DEFAULT_SERVICE_TIME", "30" if CPU_ONLY else "10"))
+)
+
+# Identical prompts against the same model/config are answered from cache.
+# Set COMPLETION_CACHE_DB to a file path to keep entries across restarts.
+COMPLETION_CACHE_ENABLED = os.getenv("COMPLETION_CACHE_ENABLED", "1") == "1"
+completion_cache = CompletionCache(
+    max_entries=int(os.getenv("COMPLETION_CACHE_SIZE", "256")),
+    db_path=os.getenv("COMPLETION_CACHE_DB") or None,
+    ttl_seconds=float(os.getenv("COMPLETION_CACHE_TTL", str(7 * 24 * 3600))),
+    max_disk_entries=int(os.getenv("COMPLETION_CACHE_MAX_ROWS", "5000"))
+) if COMPLETION_CACHE_ENABLED else None
+
 # =============================================================================
 # APP & CORS CONFIGURATION
 # =============================================================================
@@ -122,6 +179,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(SchedulerOverloaded)
+async def scheduler_overloaded_handler(request: Request, exc: SchedulerOverloaded):
+    return JSONResponse(
+        status_code=429,
+        content={"type": "error", "message": str(exc), "retry_after": exc.retry_after, "success": False},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Include enhanced GitHub router - NEW
 app.include_router(enhanced_github_router)
 
@@ -135,8 +200,18 @@ BASE_DIR = Path(__file__).resolve().parent
 GENERATED_DIR = BASE_DIR / "generated"
 GENERATED_DIR.mkdir(exist_ok=True)
 
+# Generated code/tests are content-addressed. Retention is opt-in (0 = keep everything);
+# files indexed from before the manifest are never collected
+ARTIFACT_MAX_AGE_DAYS = float(os.getenv("ARTIFACT_MAX_AGE_DAYS", "0"))
+ARTIFACT_MAX_COUNT = int(os.getenv("ARTIFACT_MAX_COUNT", "0"))
+artifact_store = ArtifactStore(
+    GENERATED_DIR,
+    max_age_seconds=ARTIFACT_MAX_AGE_DAYS * 24 * 3600,
+    max_artifacts=ARTIFACT_MAX_COUNT
+)
+
 # Initialize enhanced GitHub agent - NEW
-enhanced_github_agent = EnhancedGitHubAgent(GENERATED_DIR)
+enhanced_github_agent = EnhancedGitHubAgent(GENERATED_DIR, catalog=artifact_store)
 
 # =============================================================================
 # DATABASE INTEGRATION
@@ -206,18 +281,28 @@ class AgentMemory(BaseModel):
 # BASE AGENT
 # =============================================================================
 class BaseAgent(ABC):
+    # Pluggable completion cache; set to None (per class or instance) to always generate
+    completion_cache: Optional[CompletionCache] = completion_cache
+    
     def __init__(self, agent_id: str, agent_type: str, role: str, 
                  model_name: str = DEFAULT_MODEL, model_config: Dict[str, Any] = None):
         self.agent_id = agent_id
         self.agent_type = agent_type
         self.role = role
+        self.status_listener: Optional[Callable[['BaseAgent'], None]] = None
+        self.token_sink: Optional[Callable[['BaseAgent', str], Awaitable[None]]] = None
+        self.message_emitter: Optional[Callable[[AgentMessage], None]] = None
+        self.workflow_run: Optional[WorkflowRun] = None
+        self.conversation_id: Optional[str] = None
         self.status = AgentStatus.IDLE
         self.memory = AgentMemory()
+        self.model_name = model_name
         self.model_config = model_config or {}
         
         model_specific_config = MODEL_CONFIGS.get(model_name, DEFAULT_GPU_CONFIG.copy())
         final_config = {**DEFAULT_GPU_CONFIG, **model_specific_config, **self.model_config}
-        self.llm = OllamaLLM(model=model_name, **final_config)
+        self.llm_config = final_config
+        self.llm = ollama_clients.get(model_name, final_config)
         
         self.message_handlers: Dict[MessageType, Callable] = {
             MessageType.TASK: self.handle_task,
@@ -228,7 +313,19 @@ class BaseAgent(ABC):
             MessageType.STATUS: self.handle_status
         }
     
+    @property
+    def status(self) -> AgentStatus:
+        return self._status
+    
+    @status.setter
+    def status(self, value: AgentStatus):
+        changed = value != getattr(self, "_status", None)
+        self._status = value
+        if changed and self.status_listener:
+            self.status_listener(self)
+    
     async def process_message(self, message: AgentMessage) -> List[AgentMessage]:
+        started = time.perf_counter()
         try:
             self.status = AgentStatus.WORKING
             self.memory.add_message(message)
@@ -246,6 +343,92 @@ class BaseAgent(ABC):
         except Exception as e:
             self.status = AgentStatus.ERROR
             return [self.create_error_message(message.from_agent, str(e))]
+        finally:
+            if self.workflow_run:
+                self.workflow_run.add_timing(self.agent_id, time.perf_counter() - started)
+    
+    def _scheduler_tenant(self) -> str:
+        """Queue fairness is per conversation, falling back to the workflow"""
+        return self.conversation_id or self._workflow_id() or self.agent_id
+    
+    def _workflow_id(self) -> Optional[str]:
+        return self.workflow_run.workflow_id if self.workflow_run else None
+    
+    def record_result(self, **fields: Any):
+        """Write outputs into this workflow's run record (no-op outside a workflow)"""
+        if self.workflow_run:
+            self.workflow_run.record(**fields)
+    
+    async def _run_blocking(self, func: Callable, *args, **kwargs):
+        """Run a blocking call on the shared worker pool without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(llm_executor, lambda: func(*args, **kwargs))
+    
+    async def _generate(self, prompt: str, stream: bool = False,
+                        sink: Optional[Callable[['BaseAgent', str], Awaitable[None]]] = None) -> str:
+        """Non-blocking LLM call for every agent; cached, and streamed to the token sink when stream=True"""
+        sink = sink or (self.token_sink if stream else None)
+        cache = self.completion_cache
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, self.model_name, self.llm_config, prompt)
+            if cached is not None:
+                if sink:
+                    await sink(self, cached)
+                return cached
+        
+        priority = PRIORITY_SHORT if len(prompt) <= SCHEDULER_SHORT_PROMPT_CHARS else PRIORITY_NORMAL
+        async with inference_scheduler.slot(self.model_name, tenant=self._scheduler_tenant(), priority=priority):
+            if sink:
+                response = await self._stream_generate(prompt, sink)
+            else:
+                response = await self._run_blocking(self.llm.invoke, prompt)
+        
+        if cache is not None:
+            await asyncio.to_thread(cache.put, self.model_name, self.llm_config, prompt, response)
+        return response
+    
+    async def _stream_generate(self, prompt: str, sink: Callable[['BaseAgent', str], Awaitable[None]]) -> str:
+        """Iterate the model's token stream on the worker pool, forwarding coalesced chunks"""
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        stopped = threading.Event()
+        
+        def produce() -> str:
+            parts, buffer = [], []
+            buffered = 0
+            last_flush = time.monotonic()
+            try:
+                for token in self.llm.stream(prompt):
+                    if stopped.is_set():
+                        # Leaving the loop closes the stream and its connection to Ollama
+                        break
+                    parts.append(token)
+                    buffer.append(token)
+                    buffered += len(token)
+                    now = time.monotonic()
+                    if len(parts) == 1 or buffered >= STREAM_CHUNK_CHARS or now - last_flush >= STREAM_FLUSH_INTERVAL:
+                        loop.call_soon_threadsafe(chunks.put_nowait, "".join(buffer))
+                        buffer, buffered, last_flush = [], 0, now
+                if buffer:
+                    loop.call_soon_threadsafe(chunks.put_nowait, "".join(buffer))
+                return "".join(parts)
+            finally:
+                loop.call_soon_threadsafe(chunks.put_nowait, None)
+        
+        producer = loop.run_in_executor(llm_executor, produce)
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    break
+                try:
+                    await sink(self, chunk)
+                except Exception as e:
+                    print(f"⚠️ Token forwarding failed: {e}")
+            return await producer
+        except asyncio.CancelledError:
+            stopped.set()
+            raise
     
     def create_message(self, to_agent: str, message_type: MessageType, 
                       content: str, metadata: Dict[str, Any] = None) -> AgentMessage:
@@ -287,11 +470,26 @@ class BaseAgent(ABC):
 # =============================================================================
 # COORDINATOR AGENT
 # =============================================================================
+PLANNER_RULES_ENABLED = os.getenv("PLANNER_RULES_ENABLED", "1") == "1"
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "256"))
+task_planner = TaskPlanner(max_entries=PLAN_CACHE_SIZE, rules_enabled=PLANNER_RULES_ENABLED)
+
 class CoordinatorAgent(BaseAgent):
+    def __init__(self, agent_id: str, agent_type: str, role: str, 
+                 model_name: str = DEFAULT_MODEL, model_config: Dict[str, Any] = None):
+        # Constrain the model to emit JSON so plans parse instead of falling back
+        super().__init__(agent_id, agent_type, role, model_name, {"format": "json", **(model_config or {})})
+    
     async def handle_task(self, message: AgentMessage) -> List[AgentMessage]:
         try:
             print(f"🎯 CoordinatorAgent received task: {message.content}")
             
+            steps = task_planner.plan_without_llm(message.content)
+            if steps is not None:
+                print(f"⚡ Planned without the model ({len(steps)} steps)")
+                self.record_result(plan=steps)
+                return self._dispatch(steps)
+            
             context = self.memory.get_context_for_prompt()
             
             prompt = f"""
@@ -310,7 +508,10 @@ class CoordinatorAgent(BaseAgent):
             - tester: Creates test cases and validates code
             - runner: Executes tests and reports results
             
-            Respond with a JSON structure like this:
+            Respond with ONLY a JSON object matching this schema:
+            {PLAN_JSON_SCHEMA}
+            
+            Example:
             {{
                 "steps": [
                     {{"agent": "coder", "task": "Write a Python function that...", "priority": 1}},
@@ -319,34 +520,37 @@ class CoordinatorAgent(BaseAgent):
             }}
             """
             
-            response = self.llm.invoke(prompt)
+            # Steps are validated as the plan streams; on a bus the first one starts before the rest is generated
+            parser = IncrementalPlanParser()
+            dispatched: List[Dict[str, Any]] = []
             
-            try:
-                plan = json.loads(response)
-                steps = plan.get("steps", [])
-            except:
-                steps = [
-                    {"agent": "coder", "task": message.content, "priority": 1},
-                    {"agent": "tester", "task": "Create tests for the generated code", "priority": 2}
-                ]
+            async def on_plan_chunk(agent: BaseAgent, chunk: str):
+                for step in parser.feed(chunk):
+                    if self.message_emitter:
+                        self.message_emitter(self._dispatch([step])[0])
+                        dispatched.append(step)
+                if self.token_sink:
+                    await self.token_sink(agent, chunk)
             
-            responses = []
-            for step in steps:
-                agent_id = step["agent"]
-                task = step["task"]
-                
-                task_message = self.create_message(
-                    to_agent=agent_id,
-                    message_type=MessageType.TASK,
-                    content=task,
-                    metadata={"priority": step.get("priority", 1)}
-                )
-                responses.append(task_message)
+            response = await self._generate(prompt, sink=on_plan_chunk)
+            steps = task_planner.decode(message.content, response, streamed=parser)
+            self.record_result(plan=steps)
             
-            return responses
+            return self._dispatch([step for step in steps if step not in dispatched])
             
         except Exception as e:
             return [self.create_error_message(message.from_agent, f"Coordination failed: {str(e)}")]
+    
+    def _dispatch(self, steps: List[Dict[str, Any]]) -> List[AgentMessage]:
+        return [
+            self.create_message(
+                to_agent=step["agent"],
+                message_type=MessageType.TASK,
+                content=step["task"],
+                metadata={"priority": step.get("priority", 1)}
+            )
+            for step in steps
+        ]
 
 # =============================================================================
 # CODER AGENT
@@ -374,15 +578,13 @@ CRITICAL REQUIREMENTS:
 Generate ONLY the function code, nothing else.
 """
             
-            response = self.llm.invoke(prompt)
+            response = await self._generate(prompt, stream=True)
             code = self._simple_code_extraction(response)
             
-            timestamp = _timestamp()
-            filename = f"code_{timestamp}.py"
+            artifact = await asyncio.to_thread(artifact_store.put, "code", code, self._workflow_id())
+            filename = artifact["filename"]
             filepath = GENERATED_DIR / filename
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(code)
+            self.record_result(code=code, code_file=filename)
             
             response_message = self.create_message(
                 to_agent=message.from_agent,
@@ -468,7 +670,7 @@ class TesterAgent(BaseAgent):
             Generate only the test code, no explanations or markdown formatting.
             """
             
-            response = self.llm.invoke(prompt)
+            response = await self._generate(prompt, stream=True)
             test_code = self._extract_and_clean_test_code(response)
             
             if not test_code or len(test_code.strip()) < 10:
@@ -477,12 +679,10 @@ class TesterAgent(BaseAgent):
             if not self._validate_python_syntax(test_code):
                 test_code = self._apply_test_emergency_fixes(test_code)
             
-            timestamp = _timestamp()
-            filename = f"test_{timestamp}.py"
+            artifact = await asyncio.to_thread(artifact_store.put, "test", test_code, self._workflow_id())
+            filename = artifact["filename"]
             filepath = GENERATED_DIR / filename
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(test_code)
+            self.record_result(tests=test_code, test_file=filename)
             
             response_message = self.create_message(
                 to_agent=message.from_agent,
@@ -583,6 +783,25 @@ if __name__ == "__main__":
 # =============================================================================
 # RUNNER AGENT
 # =============================================================================
+TEST_RUNNER_POOL_SIZE = int(os.getenv("TEST_RUNNER_POOL_SIZE", "2"))
+TEST_TIMEOUT = float(os.getenv("TEST_TIMEOUT", "30"))
+TEST_RESULT_CACHE_SIZE = int(os.getenv("TEST_RESULT_CACHE_SIZE", "512"))  # 0 disables memoized results
+# Sandbox limits for generated code (0 = unlimited); TEST_ISOLATE_NETWORK=1 needs unshare
+TEST_SANDBOX_LIMITS = {
+    "memory_mb": int(os.getenv("TEST_MEMORY_LIMIT_MB", "512")),
+    "cpu_seconds": int(os.getenv("TEST_CPU_LIMIT_SECONDS", str(int(TEST_TIMEOUT)))),
+    "max_processes": int(os.getenv("TEST_MAX_PROCESSES", "16")),
+    "file_size_mb": int(os.getenv("TEST_MAX_FILE_SIZE_MB", "16"))
+}
+TEST_ISOLATE_NETWORK = os.getenv("TEST_ISOLATE_NETWORK", "0") == "1"
+runner_pool = RunnerPool(
+    size=TEST_RUNNER_POOL_SIZE,
+    timeout=TEST_TIMEOUT,
+    result_cache=TestResultCache(max_entries=TEST_RESULT_CACHE_SIZE) if TEST_RESULT_CACHE_SIZE > 0 else None,
+    limits=TEST_SANDBOX_LIMITS,
+    isolate_network=TEST_ISOLATE_NETWORK
+)
+
 class RunnerAgent(BaseAgent):
     async def handle_task(self, message: AgentMessage) -> List[AgentMessage]:
         return [self.create_message(message.from_agent, MessageType.RESPONSE, 
@@ -598,8 +817,10 @@ class RunnerAgent(BaseAgent):
             if not test_code:
                 return [self.create_error_message(message.from_agent, "No test code provided")]
             
-            test_results = self._run_tests(original_code, test_code)
-            tests_passed = "✅ TESTS PASSED" in test_results
+            test_report = await self._run_tests(original_code, test_code)
+            test_results = format_test_report(test_report)
+            tests_passed = test_report["passed"]
+            self.record_result(test_results=test_results, tests_passed=tests_passed, test_report=test_report)
             
             response_message = self.create_message(
                 to_agent=message.from_agent,
@@ -608,6 +829,12 @@ class RunnerAgent(BaseAgent):
                 metadata={
                     "test_results": test_results,
                     "tests_passed": tests_passed,
+                    "test_report": test_report,
+                    "resource_usage": {
+                        "cpu_time": test_report.get("cpu_time"),
+                        "peak_rss": test_report.get("peak_rss"),
+                        "wall_time": test_report.get("wall_time")
+                    },
                     "original_code": original_code,
                     "test_code": test_code
                 }
@@ -618,32 +845,9 @@ class RunnerAgent(BaseAgent):
         except Exception as e:
             return [self.create_error_message(message.from_agent, f"Test execution failed: {str(e)}")]
     
-    def _run_tests(self, code: str, test_code: str) -> str:
-        try:
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                f.write(code)
-                f.write("\n\n")
-                f.write(test_code)
-                test_file = f.name
-            
-            result = subprocess.run(
-                [sys.executable, test_file],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            
-            os.unlink(test_file)
-            
-            if result.returncode == 0:
-                return f"✅ TESTS PASSED\n{result.stdout}"
-            else:
-                return f"❌ TESTS FAILED\n{result.stdout}\n{result.stderr}"
-                
-        except subprocess.TimeoutExpired:
-            return "❌ TESTS TIMEOUT - Tests took too long to run"
-        except Exception as e:
-            return f"❌ TEST EXECUTION ERROR: {str(e)}"
+    async def _run_tests(self, code: str, test_code: str) -> Dict[str, Any]:
+        """Run tests in a warm, isolated worker and return the structured report"""
+        return await runner_pool.run(code, test_code)
 
 # =============================================================================
 # ENHANCED GITHUB INTEGRATION - NEW
@@ -669,7 +873,8 @@ class EnhancedGitHubAgentWrapper(BaseAgent):
             if "extract" in task_content and "push" in task_content:
                 # Extract and push code
                 repo_name = self._extract_repo_name_from_message(message.content)
-                result = self.enhanced_agent.extract_and_push_code(
+                result = await self._run_blocking(
+                    self.enhanced_agent.extract_and_push_code,
                     repo_name=repo_name,
                     commit_message=f"AI Generated: {message.content[:50]}...",
                     auto_create_repo=True
@@ -695,7 +900,7 @@ Your AI-generated code is now on GitHub!"""
             
             elif "preview" in task_content or "analyze" in task_content:
                 # Preview extractable code
-                result = self.enhanced_agent.preview_extractable_code()
+                result = await self._run_blocking(self.enhanced_agent.preview_extractable_code)
                 
                 if result["success"]:
                     files_info = []
@@ -770,64 +975,242 @@ class AgentFactory:
 # =============================================================================
 # MESSAGE BUS
 # =============================================================================
+WORKFLOW_RUNS_MAX = int(os.getenv("WORKFLOW_RUNS_MAX", "500"))
+workflow_runs = WorkflowRunStore(max_runs=WORKFLOW_RUNS_MAX)
+
+# Background workflow jobs (/chat?background=true, /run-workflow?background=true)
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+JOB_HISTORY_MAX = int(os.getenv("JOB_HISTORY_MAX", "1000"))
+job_queue = JobQueue(concurrency=JOB_CONCURRENCY, max_jobs=JOB_HISTORY_MAX)
+
+# Sibling messages are delivered concurrently; each agent handles at most
+# AGENT_MAX_CONCURRENCY messages at once and a workflow is cut off after
+# MAX_WORKFLOW_MESSAGES deliveries to guard against runaway message loops.
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "1"))
+MAX_WORKFLOW_MESSAGES = int(os.getenv("MAX_WORKFLOW_MESSAGES", "200"))
+WORKFLOW_TIMEOUT = float(os.getenv("WORKFLOW_TIMEOUT", "600"))
+
 class MessageBus:
-    def __init__(self):
+    def __init__(self, max_concurrency_per_agent: int = AGENT_MAX_CONCURRENCY,
+                 max_messages: int = MAX_WORKFLOW_MESSAGES,
+                 workflow_id: Optional[str] = None, conversation_id: Optional[str] = None):
         self.agents: Dict[str, BaseAgent] = {}
+        # A caller-chosen workflow_id lets /ws clients subscribe before the run starts
+        self.requested_workflow_id = workflow_id
+        self.conversation_id = conversation_id
+        self.workflow_id: Optional[str] = None
+        self.listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        self.run: Optional[WorkflowRun] = None
+        self.max_concurrency_per_agent = max_concurrency_per_agent
+        self.max_messages = max_messages
+        self.messages_dispatched = 0
+        self._agent_slots: Dict[str, asyncio.Semaphore] = {}
+        self._tasks: set = set()
+        self._in_flight = 0
+        self._graph_outputs: Dict[str, List[AgentMessage]] = {}
+        self._idle = asyncio.Event()
+        self._idle.set()
     
     def register_agent(self, agent: BaseAgent):
         self.agents[agent.agent_id] = agent
+        agent.status_listener = self._on_agent_status_change
+        agent.token_sink = self._forward_tokens
+        agent.message_emitter = self.post
+        agent.workflow_run = self.run
+        agent.conversation_id = self.conversation_id
     
-    async def send_message(self, message: AgentMessage):
-        print(f"📡 Sending message: {message.from_agent} -> {message.to_agent} ({message.message_type.value})")
-        
+    def add_listener(self, listener: Callable[[str, Dict[str, Any]], None]):
+        """Observe typed workflow events: started, plan, code, tests, test_results, token, status"""
+        self.listeners.append(listener)
+    
+    def _emit(self, event: str, data: Dict[str, Any]):
+        for listener in self.listeners:
+            try:
+                listener(event, data)
+            except Exception as e:
+                print(f"⚠️ Workflow listener failed: {e}")
+    
+    def _on_run_result(self, fields: Dict[str, Any]):
+        """Turn stage results recorded by agents into typed events"""
+        if "plan" in fields:
+            self._emit("plan", {"steps": fields["plan"]})
+        if "code" in fields:
+            self._emit("code", {"code": fields["code"], "filename": fields.get("code_file")})
+        if "tests" in fields:
+            self._emit("tests", {"tests": fields["tests"], "filename": fields.get("test_file")})
+        if "test_results" in fields:
+            self._emit("test_results", {
+                "test_results": fields["test_results"],
+                "tests_passed": fields.get("tests_passed"),
+                "test_report": fields.get("test_report")
+            })
+    
+    def _start_run(self, workflow_id: str, task: str):
+        """Open the result record for this workflow and hand it to every agent"""
+        if workflow_runs.get(workflow_id) is not None:
+            raise ValueError(f"Workflow id {workflow_id} is already in use")
+        self.workflow_id = workflow_id
+        self.run = workflow_runs.start(workflow_id, task)
+        self.run.listener = self._on_run_result
+        for agent in self.agents.values():
+            agent.workflow_run = self.run
+        self._emit("started", {"workflow_id": workflow_id, "conversation_id": self.conversation_id})
+    
+    async def _forward_tokens(self, agent: BaseAgent, chunk: str):
+        """Relay streamed generation chunks to /ws as agent_token events"""
+        self._emit("token", {"agent_id": agent.agent_id, "content": chunk})
+        await websocket_manager.send_agent_token(
+            workflow_id=self.workflow_id,
+            agent_id=agent.agent_id,
+            content=chunk,
+            conversation_id=self.conversation_id
+        )
+    
+    def _on_agent_status_change(self, agent: BaseAgent):
+        """Push a workflow_status update to /ws whenever an agent changes state"""
+        if not self.workflow_id:
+            return
+        agents = {agent_id: {"status": a.status.value} for agent_id, a in self.agents.items()}
         try:
-            await websocket_manager.send_agent_message(
-                from_agent=message.from_agent,
-                to_agent=message.to_agent,
-                content=message.content,
-                message_type=message.message_type.value
+            task = asyncio.get_running_loop().create_task(self._publish_status("running", agents))
+        except RuntimeError:
+            return
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _publish_status(self, status: str, agents: Dict[str, Dict[str, str]]):
+        self._emit("status", {"status": status, "agents": agents})
+        try:
+            await websocket_manager.send_workflow_status(
+                workflow_id=self.workflow_id,
+                status=status,
+                agents=agents,
+                conversation_id=self.conversation_id
             )
         except Exception as e:
-            print(f"⚠️ WebSocket update failed: {e}")
-        
-        target_agent = self.agents.get(message.to_agent)
-        if not target_agent:
-            print(f"⚠️ Warning: Agent {message.to_agent} not found")
+            print(f"WebSocket progress update failed: {e}")
+    
+    def cancel(self):
+        """Cancel every delivery still in flight"""
+        for task in list(self._tasks):
+            task.cancel()
+    
+    def _on_cancelled(self):
+        # Deliveries run as their own tasks, so cancelling the workflow must reach them explicitly;
+        # they in turn stop token streams and kill test workers
+        self.cancel()
+        if self.run:
+            self.run.finish("cancelled")
+        self._emit("status", {"status": "cancelled", "agents": {}})
+    
+    @property
+    def is_idle(self) -> bool:
+        return self._in_flight == 0
+    
+    def post(self, message: AgentMessage):
+        """Schedule a message for delivery without waiting for it to be handled"""
+        if self.messages_dispatched >= self.max_messages:
+            print(f"⚠️ Message limit ({self.max_messages}) reached, dropping {message.from_agent} -> {message.to_agent}")
             return
         
-        response_messages = await target_agent.process_message(message)
+        self.messages_dispatched += 1
+        self._in_flight += 1
+        self._idle.clear()
         
-        for response in response_messages:
-            await self.send_message(response)
+        task = asyncio.create_task(self._deliver(message))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def send_message(self, message: AgentMessage):
+        """Deliver a message and wait until every message it triggers has been handled"""
+        self.post(message)
+        await self.wait_until_idle()
+    
+    async def wait_until_idle(self, timeout: Optional[float] = None):
+        """Completion signal: resolves once no messages are queued or being handled"""
+        await asyncio.wait_for(self._idle.wait(), timeout)
+    
+    def _agent_slot(self, agent_id: str) -> asyncio.Semaphore:
+        slot = self._agent_slots.get(agent_id)
+        if slot is None:
+            slot = asyncio.Semaphore(self.max_concurrency_per_agent)
+            self._agent_slots[agent_id] = slot
+        return slot
+    
+    async def _deliver(self, message: AgentMessage, track: bool = True):
+        """Hand a message to its agent; graph runs (track=False) keep responses instead of routing them"""
+        try:
+            print(f"📡 Sending message: {message.from_agent} -> {message.to_agent} ({message.message_type.value})")
+            
+            try:
+                await websocket_manager.send_agent_message(
+                    from_agent=message.from_agent,
+                    to_agent=message.to_agent,
+                    content=message.content,
+                    message_type=message.message_type.value,
+                    workflow_id=self.workflow_id,
+                    conversation_id=self.conversation_id
+                )
+            except Exception as e:
+                print(f"⚠️ WebSocket update failed: {e}")
+            
+            target_agent = self.agents.get(message.to_agent)
+            if not target_agent:
+                print(f"⚠️ Warning: Agent {message.to_agent} not found")
+                return
+            
+            async with self._agent_slot(message.to_agent):
+                response_messages = await target_agent.process_message(message)
+            
+            if not track:
+                self._graph_outputs[message.id] = response_messages
+                return
+            
+            # Responses fan out as independent deliveries instead of recursing
+            for response in response_messages:
+                self.post(response)
+        except Exception as e:
+            print(f"⚠️ Message delivery failed: {e}")
+        finally:
+            if track:
+                self._in_flight -= 1
+                if self._in_flight == 0:
+                    self._idle.set()
+    
+    def _create_agents(self, workflow_agents: List[Dict[str, Any]]):
+        for agent_config in workflow_agents:
+            agent = AgentFactory.create_agent(
+                agent_id=agent_config["id"],
+                agent_type=agent_config["type"],
+                role=agent_config["role"],
+                model_name=agent_config.get("model", "mistral"),
+                model_config=agent_config.get("model_config", {})
+            )
+            self.register_agent(agent)
+    
+    def _collect_results(self) -> Dict[str, Any]:
+        return {
+            agent_id: {
+                "status": agent.status.value,
+                "memory": len(agent.memory.short_term),
+                "messages": [msg.content for msg in agent.memory.short_term[-5:]]
+            }
+            for agent_id, agent in self.agents.items()
+        }
     
     async def process_workflow(self, initial_task: str, workflow_agents: List[Dict[str, Any]]) -> Dict[str, Any]:
         try:
             print(f"🚀 Starting workflow with task: {initial_task}")
             
-            for agent_config in workflow_agents:
-                agent = AgentFactory.create_agent(
-                    agent_id=agent_config["id"],
-                    agent_type=agent_config["type"],
-                    role=agent_config["role"],
-                    model_name=agent_config.get("model", "mistral"),
-                    model_config=agent_config.get("model_config", {})
-                )
-                self.register_agent(agent)
+            self._create_agents(workflow_agents)
             
             coordinator = self.agents.get("coordinator")
             if not coordinator:
                 raise ValueError("No coordinator agent found")
             
-            workflow_id = f"workflow_{datetime.now().timestamp()}"
-            
-            try:
-                await websocket_manager.send_workflow_status(
-                    workflow_id=workflow_id,
-                    status="running",
-                    agents={agent_id: {"status": "idle"} for agent_id in self.agents.keys()}
-                )
-            except Exception as e:
-                print(f"WebSocket status update failed: {e}")
+            workflow_id = self.requested_workflow_id or f"workflow_{datetime.now().timestamp()}"
+            self._start_run(workflow_id, initial_task)
+            await self._publish_status("running", {agent_id: {"status": "idle"} for agent_id in self.agents.keys()})
             
             initial_message = AgentMessage(
                 id=f"workflow_start_{datetime.now().timestamp()}",
@@ -837,40 +1220,105 @@ class MessageBus:
                 content=initial_task
             )
             
-            await self.send_message(initial_message)
+            # Returns as soon as the last in-flight message has been handled
+            self.post(initial_message)
+            try:
+                await self.wait_until_idle(timeout=WORKFLOW_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.cancel()
+                self.run.finish("failed")
+                await self._publish_status("failed", {agent_id: {"status": agent.status.value} for agent_id, agent in self.agents.items()})
+                return {"success": False, "error": f"Workflow timed out after {WORKFLOW_TIMEOUT:.0f}s", "message": "Workflow failed", "workflow_id": workflow_id}
             
-            for i in range(10):
-                await asyncio.sleep(0.2)
-                try:
-                    await websocket_manager.send_workflow_status(
-                        workflow_id=workflow_id,
-                        status="running",
-                        agents={agent_id: {"status": "working"} for agent_id in self.agents.keys()}
-                    )
-                except Exception as e:
-                    print(f"WebSocket progress update failed: {e}")
-            
-            results = {}
-            for agent_id, agent in self.agents.items():
-                results[agent_id] = {
-                    "status": agent.status.value,
-                    "memory": len(agent.memory.short_term),
-                    "messages": [msg.content for msg in agent.memory.short_term[-5:]]
-                }
+            # Let pending progress updates go out before the completion status
+            if self._tasks:
+                await asyncio.gather(*list(self._tasks), return_exceptions=True)
+            
+            results = self._collect_results()
+            self.run.finish("completed")
+            
+            await self._publish_status("completed", {agent_id: {"status": agent_data["status"]} for agent_id, agent_data in results.items()})
+            
+            return {"success": True, "results": results, "message": "Workflow completed successfully", "workflow_id": workflow_id}
+        
+        except asyncio.CancelledError:
+            self._on_cancelled()
+            raise
+        except Exception as e:
+            return {"success": False, "error": str(e), "message": "Workflow failed"}
+    
+    async def process_graph_workflow(self, initial_task: str, workflow_agents: List[Dict[str, Any]],
+                                     edges: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """Run a user-drawn topology: the connections decide who runs next, so no coordinator LLM call is needed"""
+        try:
+            print(f"🚀 Starting graph workflow with task: {initial_task}")
+            
+            self._create_agents(workflow_agents)
+            plan = compile_flow_cached([agent_config["id"] for agent_config in workflow_agents], edges)
+            
+            workflow_id = self.requested_workflow_id or f"workflow_{datetime.now().timestamp()}"
+            self._start_run(workflow_id, initial_task)
+            await self._publish_status("running", {agent_id: {"status": "idle"} for agent_id in self.agents.keys()})
+            
+            async def run_node(agent_id: str, inputs: Dict[str, List[AgentMessage]]) -> List[AgentMessage]:
+                message = self._graph_message(agent_id, initial_task, inputs)
+                if message is None:
+                    return []
+                await self._deliver(message, track=False)
+                return self._graph_outputs.pop(message.id, [])
             
             try:
-                await websocket_manager.send_workflow_status(
-                    workflow_id=workflow_id,
-                    status="completed",
-                    agents={agent_id: {"status": agent_data["status"]} for agent_id, agent_data in results.items()}
-                )
-            except Exception as e:
-                print(f"WebSocket completion update failed: {e}")
+                await asyncio.wait_for(execute_flow(plan, run_node), timeout=WORKFLOW_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.run.finish("failed")
+                await self._publish_status("failed", {agent_id: {"status": agent.status.value} for agent_id, agent in self.agents.items()})
+                return {"success": False, "error": f"Workflow timed out after {WORKFLOW_TIMEOUT:.0f}s", "message": "Workflow failed", "workflow_id": workflow_id}
             
-            return {"success": True, "results": results, "message": "Workflow completed successfully"}
-                
+            if self._tasks:
+                await asyncio.gather(*list(self._tasks), return_exceptions=True)
+            
+            results = self._collect_results()
+            self.run.finish("completed")
+            await self._publish_status("completed", {agent_id: {"status": agent_data["status"]} for agent_id, agent_data in results.items()})
+            
+            return {"success": True, "results": results, "plan": plan.to_dict(), "message": "Workflow completed successfully", "workflow_id": workflow_id}
+        
+        except asyncio.CancelledError:
+            self._on_cancelled()
+            raise
         except Exception as e:
             return {"success": False, "error": str(e), "message": "Workflow failed"}
+    
+    def _graph_message(self, agent_id: str, task: str, inputs: Dict[str, List[AgentMessage]]) -> Optional[AgentMessage]:
+        """Build a node's input from its predecessors' outputs; coordinators just pass the task through"""
+        agent = self.agents[agent_id]
+        if agent.agent_type == "coordinator":
+            return None
+        
+        # Later predecessors win on key clashes, e.g. tester's original_code over coder's code
+        data: Dict[str, Any] = {}
+        for responses in inputs.values():
+            for response in responses:
+                if response.message_type == MessageType.DATA:
+                    data.update(response.metadata)
+        
+        sender = ",".join(inputs.keys()) or "system"
+        if (agent.agent_type == "tester" and data.get("code")) or (agent.agent_type == "runner" and data.get("test_code")):
+            return AgentMessage(
+                id=f"graph_{agent_id}_{datetime.now().timestamp()}",
+                from_agent=sender,
+                to_agent=agent_id,
+                message_type=MessageType.DATA,
+                content=f"Output from {sender}",
+                metadata=data
+            )
+        return AgentMessage(
+            id=f"graph_{agent_id}_{datetime.now().timestamp()}",
+            from_agent=sender,
+            to_agent=agent_id,
+            message_type=MessageType.TASK,
+            content=task
+        )
 
 # =============================================================================
 # REQUEST MODELS
@@ -880,6 +1328,7 @@ class PromptRequest(BaseModel):
     code_history: List[str] = []
     error_history: List[str] = []
     conversation_id: Optional[str] = None
+    workflow_id: Optional[str] = None  # Optional client-chosen id, for subscribing on /ws before the run starts
 
 class WorkflowRequest(BaseModel):
     task: str
@@ -906,13 +1355,11 @@ class ManualFlowRequest(BaseModel):
     prompt: str
     boxes: List[ManualAgentBox]
     connections: List[ManualAgentConnection]
+    workflow_id: Optional[str] = None
 
 # =============================================================================
 # UTILITY FUNCTIONS
 # =============================================================================
-def _timestamp() -> str:
-    return datetime.now().strftime("%Y%m%d_%H%M%S")
-
 def _extract_code(response: str) -> str:
     code_patterns = [
         r'```python\n(.*?)\n```',
@@ -971,87 +1418,44 @@ async def api_status():
         "github_integration": "Enhanced GitHub integration available"  # NEW
     }
 
-@app.post("/chat")
-async def chat(request: PromptRequest):
-    """Main chat endpoint for automated workflows"""
+CHAT_WORKFLOW_AGENTS = [
+    {"id": "coordinator", "type": "coordinator", "role": "Smart Coordinator", "model": "mistral"},
+    {"id": "coder", "type": "coder", "role": "Python Developer", "model": "mistral"},
+    {"id": "tester", "type": "tester", "role": "Test Engineer", "model": "mistral"},
+    {"id": "runner", "type": "runner", "role": "Test Runner"}
+]
+
+def _admit_workflow(workflow_agents: List[Dict[str, Any]]):
+    """Shed load up front: reject a workflow whose models already have a full queue (429 + Retry-After)"""
+    for model in {agent_config.get("model", "mistral") for agent_config in workflow_agents if agent_config.get("type") != "runner"}:
+        inference_scheduler.check_admission(model)
+
+def _create_chat_bus(request: PromptRequest) -> MessageBus:
+    message_bus = MessageBus(workflow_id=request.workflow_id, conversation_id=request.conversation_id)
+    
+    if request.conversation_id:
+        db_integration.attach_to_message_bus(message_bus, conversation_id=request.conversation_id)
+    else:
+        db_integration.attach_to_message_bus(message_bus)
+    return message_bus
+
+async def _run_chat_workflow(request: PromptRequest, message_bus: MessageBus) -> Dict[str, Any]:
+    """Run the coordinator -> coder -> tester -> runner pipeline and summarize its run record"""
     try:
         print(f"Starting chat workflow with prompt: {request.prompt}")
         
-        if not request.prompt or not request.prompt.strip():
-            return {"type": "error", "message": "No prompt provided", "success": False}
-        
-        message_bus = MessageBus()
-        
-        if request.conversation_id:
-            db_integration.attach_to_message_bus(message_bus, conversation_id=request.conversation_id)
-        else:
-            db_integration.attach_to_message_bus(message_bus)
-        
-        workflow_agents = [
-            {"id": "coordinator", "type": "coordinator", "role": "Smart Coordinator", "model": "mistral"},
-            {"id": "coder", "type": "coder", "role": "Python Developer", "model": "mistral"},
-            {"id": "tester", "type": "tester", "role": "Test Engineer", "model": "mistral"},
-            {"id": "runner", "type": "runner", "role": "Test Runner"}
-        ]
-        
-        result = await message_bus.process_workflow(request.prompt, workflow_agents)
+        result = await message_bus.process_workflow(request.prompt, CHAT_WORKFLOW_AGENTS)
         
         if not result.get("success", False):
             return {"type": "error", "message": result.get("message", "Workflow failed"), "success": False}
         
-        # Extract results from workflow
-        code = None
-        tests = None
-        test_results = None
-        tests_passed = None
-        
-        for agent_id, agent in message_bus.agents.items():
-            if agent_id == "coder":
-                for msg in agent.memory.short_term:
-                    if msg.metadata.get("code"):
-                        code = msg.metadata["code"]
-                        break
-            elif agent_id == "tester":
-                for msg in agent.memory.short_term:
-                    if msg.metadata.get("test_code"):
-                        tests = msg.metadata["test_code"]
-                        break
-            elif agent_id == "runner":
-                for msg in agent.memory.short_term:
-                    if msg.metadata.get("test_results"):
-                        test_results = msg.metadata["test_results"]
-                        tests_passed = msg.metadata.get("tests_passed", False)
-                        break
-        
-        # Try to read from files if not found in memory
-        if not code:
-            try:
-                code_files = list(GENERATED_DIR.glob("code_*.py"))
-                if code_files:
-                    latest_code_file = max(code_files, key=lambda x: x.stat().st_mtime)
-                    with open(latest_code_file, 'r', encoding='utf-8') as f:
-                        code = f.read()
-            except Exception as e:
-                print(f"Could not read code from file: {e}")
-        
-        if not tests:
-            try:
-                test_files = list(GENERATED_DIR.glob("test_*.py"))
-                if test_files:
-                    latest_test_file = max(test_files, key=lambda x: x.stat().st_mtime)
-                    with open(latest_test_file, 'r', encoding='utf-8') as f:
-                        tests = f.read()
-            except Exception as e:
-                print(f"Could not read tests from file: {e}")
-        
-        if not test_results and code and tests:
-            try:
-                temp_runner = RunnerAgent("temp_runner", "runner", "Test Runner")
-                test_results = temp_runner._run_tests(code, tests)
-                tests_passed = "TESTS PASSED" in test_results
-            except Exception as e:
-                test_results = f"Test execution failed: {str(e)}"
-                tests_passed = False
+        # Results were recorded by the agents of this workflow only
+        run = workflow_runs.get(result["workflow_id"])
+        code = run.get("code")
+        tests = run.get("tests")
+        test_results = run.get("test_results")
+        tests_passed = run.get("tests_passed")
+        test_report = run.get("test_report")
         
         response_type = "coding" if (code or tests) else "error"
         
@@ -1062,12 +1466,106 @@ async def chat(request: PromptRequest):
             "tests": tests,
             "test_results": test_results,
             "tests_passed": tests_passed,
+            "test_report": test_report,
+            "workflow_id": run.workflow_id,
+            "timings": run.timings,
             "success": result.get("success", False)
         }
         
     except Exception as e:
         return {"type": "error", "message": f"Error processing request: {str(e)}", "success": False}
 
+def _claim_workflow_id(workflow_id: Optional[str]):
+    """Reject a client-chosen workflow id that is taken, before any work starts (409)"""
+    if not workflow_id:
+        return
+    run = workflow_runs.get(workflow_id)
+    job = job_queue.get(workflow_id)
+    if (run is not None and run.status == "running") or (job is not None and not job.finished):
+        raise HTTPException(status_code=409, detail="workflow_id already running")
+    if run is not None:
+        raise HTTPException(status_code=409, detail="workflow_id already used")
+
+def _submit_job(kind: str, workflow_id: Optional[str], run: Callable[[str], Awaitable[Any]],
+                metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Queue a workflow; the job id doubles as its workflow id so /workflow-runs works too"""
+    job_id = workflow_id or f"workflow_{datetime.now().timestamp()}"
+    try:
+        job = job_queue.submit(kind, lambda: run(job_id), job_id=job_id, metadata=metadata)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {
+        "job_id": job.job_id,
+        "workflow_id": job.job_id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.job_id}",
+        "success": True
+    }
+
+@app.post("/chat")
+async def chat(request: PromptRequest, background: bool = False):
+    """Main chat endpoint for automated workflows; background=true returns a job id at once"""
+    if not request.prompt or not request.prompt.strip():
+        return {"type": "error", "message": "No prompt provided", "success": False}
+    _claim_workflow_id(request.workflow_id)
+    _admit_workflow(CHAT_WORKFLOW_AGENTS)
+    if background:
+        async def run(job_id: str):
+            chat_request = request.model_copy(update={"workflow_id": job_id})
+            return await _run_chat_workflow(chat_request, _create_chat_bus(chat_request))
+        return _submit_job("chat", request.workflow_id, run, {"prompt": request.prompt})
+    return await _run_chat_workflow(request, _create_chat_bus(request))
+
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(request: PromptRequest):
+    """/chat as Server-Sent Events: started, plan, token, code, tests, test_results, status, then summary"""
+    if not request.prompt or not request.prompt.strip():
+        async def rejected():
+            yield _sse("error", {"type": "error", "message": "No prompt provided", "success": False})
+        return StreamingResponse(rejected(), media_type="text/event-stream")
+    _claim_workflow_id(request.workflow_id)
+    _admit_workflow(CHAT_WORKFLOW_AGENTS)
+    
+    message_bus = _create_chat_bus(request)
+    events: asyncio.Queue = asyncio.Queue()
+    message_bus.add_listener(lambda event, data: events.put_nowait((event, data)))
+    
+    async def run_workflow():
+        try:
+            events.put_nowait(("summary", await _run_chat_workflow(request, message_bus)))
+        finally:
+            events.put_nowait(None)
+    
+    async def event_stream():
+        workflow_task = asyncio.create_task(run_workflow())
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(events.get(), SSE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": heartbeat\n\n"
+                    continue
+                if item is None:
+                    break
+                yield _sse(*item)
+        finally:
+            # Client went away: stop the pipeline instead of finishing it for nobody
+            if not workflow_task.done():
+                workflow_task.cancel()
+                message_bus.cancel()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/chat-with-github")
 async def chat_with_github_integration(request: PromptRequest):
     """NEW: Enhanced chat with automatic GitHub operations"""
@@ -1085,8 +1583,9 @@ async def chat_with_github_integration(request: PromptRequest):
                 repo_name = extract_repo_name_from_prompt(request.prompt)
                 
                 if enhanced_github_agent.is_configured():
-                    # Push to GitHub
-                    github_result = enhanced_github_agent.extract_and_push_code(
+                    # Push to GitHub (blocking HTTP + file reads, kept off the event loop)
+                    github_result = await asyncio.to_thread(
+                        enhanced_github_agent.extract_and_push_code,
                         repo_name=repo_name,
                         commit_message=f"Generated code: {request.prompt[:50]}...",
                         auto_create_repo=True
@@ -1112,6 +1611,9 @@ async def chat_with_github_integration(request: PromptRequest):
             # Regular chat without GitHub operations
             return await chat(request)
             
+    except (HTTPException, SchedulerOverloaded):
+        # 409 duplicate workflow_id / 429 + Retry-After from chat() keep their status codes
+        raise
     except Exception as e:
         return {"success": False, "error": str(e), "type": "error"}
 
@@ -1139,7 +1641,12 @@ async def analyze_generated_code():
 # =============================================================================
 
 @app.post("/run-workflow")
-async def run_workflow(request: WorkflowRequest):
+async def run_workflow(request: WorkflowRequest, background: bool = False):
+    _admit_workflow(request.agents)
+    if background:
+        async def run(job_id: str):
+            return await MessageBus(workflow_id=job_id).process_workflow(request.task, request.agents)
+        return _submit_job("workflow", None, run, {"task": request.task})
     try:
         message_bus = MessageBus()
         result = await message_bus.process_workflow(request.task, request.agents)
@@ -1149,6 +1656,8 @@ async def run_workflow(request: WorkflowRequest):
 
 @app.post("/run-manual-flow")
 async def run_manual_flow(data: ManualFlowRequest):
+    _claim_workflow_id(data.workflow_id)
+    _admit_workflow([{"type": box.agentType, "model": box.model} for box in data.boxes])
     try:
         agents = []
         for box in data.boxes:
@@ -1159,8 +1668,12 @@ async def run_manual_flow(data: ManualFlowRequest):
                 "model": box.model
             })
         
-        message_bus = MessageBus()
-        result = await message_bus.process_workflow(data.prompt, agents)
+        message_bus = MessageBus(workflow_id=data.workflow_id)
+        if data.connections:
+            edges = [(connection.fromId, connection.toId) for connection in data.connections]
+            result = await message_bus.process_graph_workflow(data.prompt, agents, edges)
+        else:
+            result = await message_bus.process_workflow(data.prompt, agents)
         
         messages = []
         for agent_id, agent in message_bus.agents.items():
@@ -1177,12 +1690,47 @@ async def run_manual_flow(data: ManualFlowRequest):
             "success": result.get("success", False),
             "messages": messages,
             "results": result.get("results", {}),
+            "plan": result.get("plan"),
+            "error": result.get("error"),
             "generated_files": []
         }
         
     except Exception as e:
         return {"success": False, "error": str(e), "messages": []}
 
+@app.get("/workflow-runs/{workflow_id}")
+async def get_workflow_run(workflow_id: str):
+    run = workflow_runs.get(workflow_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Workflow run {workflow_id} not found")
+    return run.to_dict()
+
+@app.get("/jobs")
+async def list_jobs():
+    jobs = [job.to_dict(include_result=False) for job in job_queue.list()]
+    return {"jobs": jobs, "stats": job_queue.stats()}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    data = job.to_dict()
+    run = workflow_runs.get(job_id)
+    if run is not None:
+        # Partial results (plan, code, tests) are visible while the job is still running
+        data["workflow"] = run.to_dict()
+    return data
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if not job_queue.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job {job_id} already {job.status}")
+    return {"job_id": job_id, "status": job.status, "success": True}
+
 @app.get("/health")
 async def health_check():
     github_status = "configured" if enhanced_github_agent.is_configured() else "not_configured"
@@ -1191,30 +1739,84 @@ async def health_check():
         "timestamp": datetime.now().isoformat(),
         "version": "2.0.0",
         "agents_available": ["coordinator", "coder", "tester", "runner"],
-        "github_integration": github_status  # NEW
+        "github_integration": github_status,  # NEW
+        "llm_clients": ollama_clients.stats(),
+        "inference_scheduler": inference_scheduler.stats(),
+        "test_runner": runner_pool.stats(),
+        "completion_cache": completion_cache.stats() if completion_cache else {"enabled": False},
+        "flow_plan_cache": plan_cache_stats(),
+        "planner": task_planner.stats(),
+        "workflow_runs": workflow_runs.stats(),
+        "artifacts": artifact_store.stats(),
+        "websocket": websocket_manager.stats(),
+        "jobs": job_queue.stats()
     }
 
 @app.get("/list-files")
-async def list_files():
+async def list_files(limit: Optional[int] = None, cursor: Optional[str] = None, kind: Optional[str] = None,
+                     run_id: Optional[str] = None, prefix: Optional[str] = None,
+                     sort: str = "created_at", order: str = "desc"):
+    """Catalog listing: `files` keeps the plain name list, `items` carries size/hash/run/created_at.
+    Without limit/cursor the complete list is returned (as before); with either, one page plus next_cursor"""
+    filters = {"kind": kind, "workflow_id": run_id, "prefix": prefix, "sort": sort, "order": order}
     try:
-        files = []
-        for file in GENERATED_DIR.glob("*.py"):
-            files.append(file.name)
-        return {"files": files}
+        if limit is None and cursor is None:
+            page = {"items": await asyncio.to_thread(artifact_store.list_all, **filters), "next_cursor": None}
+        else:
+            page = await asyncio.to_thread(artifact_store.list_page, limit=limit or 100, cursor=cursor, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         return {"files": [], "error": str(e)}
+    
+    items = [
+        {
+            "name": artifact["filename"],
+            "kind": artifact["kind"],
+            "size": artifact["size"],
+            "hash": artifact["digest"],
+            "run_id": artifact["workflow_id"],
+            "created_at": datetime.fromtimestamp(artifact["created_at"]).isoformat()
+        }
+        for artifact in page["items"]
+    ]
+    return {"files": [item["name"] for item in items], "items": items, "next_cursor": page["next_cursor"]}
 
 @app.get("/generated/{filename}")
-async def get_generated_file(filename: str):
+async def get_generated_file(filename: str, request: Request):
     try:
-        filepath = GENERATED_DIR / filename
-        if filepath.exists():
-            return FileResponse(filepath, media_type="text/plain")
-        else:
+        artifact = await asyncio.to_thread(artifact_store.get, filename)
+        filepath = artifact_store.path_for(filename) if artifact else None
+        if filepath is None:
             raise HTTPException(status_code=404, detail=f"File {filename} not found")
+        
+        # Content-addressed files never change, so the digest is a strong validator
+        etag = f'"{artifact["digest"]}"'
+        last_modified = formatdate(artifact["created_at"], usegmt=True)
+        headers = {"ETag": etag, "Last-Modified": last_modified, "Cache-Control": "public, max-age=3600"}
+        
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+                return Response(status_code=304, headers=headers)
+        elif request.headers.get("if-modified-since"):
+            try:
+                if int(artifact["created_at"]) <= parsedate_to_datetime(request.headers["if-modified-since"]).timestamp():
+                    return Response(status_code=304, headers=headers)
+            except (TypeError, ValueError):
+                pass
+        
+        return FileResponse(filepath, media_type="text/plain", headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading file: {str(e)}")
 
+@app.post("/artifacts/gc")
+async def collect_artifacts():
+    removed = await asyncio.to_thread(artifact_store.gc)
+    return {"success": True, "removed": removed, "stats": artifact_store.stats()}
+
 @app.get("/gpu-status")
 async def get_gpu_status():
     try:
@@ -1284,6 +1886,8 @@ async def create_conversation(request: ConversationRequest):
 @app.get("/conversations")
 async def get_conversations():
     try:
+        # Queued message writes must land before the counts are read
+        await db_integration.flush()
         conversations = await db_integration.get_conversations()
         return [
             ConversationResponse(
@@ -1302,51 +1906,214 @@ async def get_conversations():
 # WEBSOCKET MANAGER (Keep your existing implementation)
 # =============================================================================
 
+# Every client gets a bounded outbound queue drained by its own task, so a slow
+# or half-dead tab only delays itself and publishers never wait on socket I/O.
+# Queued agent_token chunks for the same agent are coalesced; when a queue is
+# still full the oldest message is dropped, and a client whose send blocks for
+# WS_SEND_TIMEOUT seconds is disconnected.
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+
+class OutboundEvent:
+    """Event payload serialized at most once, however many clients receive it"""
+    __slots__ = ("payload", "_text")
+    
+    def __init__(self, payload: Dict[str, Any]):
+        self.payload = payload
+        self._text: Optional[str] = None
+    
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = json.dumps(self.payload)
+        return self._text
+
+class ClientConnection:
+    def __init__(self, websocket: WebSocket, max_queue: int):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.topics: set = set()  # Empty = legacy firehose: receive every event
+        self.queue: deque = deque()
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.coalesced = 0
+    
+    def enqueue(self, item: Any):
+        """Queue a str or OutboundEvent without blocking"""
+        if isinstance(item, OutboundEvent) and item.payload.get("type") == "agent_token" and self.queue:
+            last, new = self.queue[-1], item.payload
+            if (isinstance(last, OutboundEvent) and last.payload.get("type") == "agent_token"
+                    and last.payload["workflow_id"] == new["workflow_id"] and last.payload["agent_id"] == new["agent_id"]):
+                self.queue[-1] = OutboundEvent({**last.payload, "content": last.payload["content"] + new["content"], "timestamp": new["timestamp"]})
+                self.coalesced += 1
+                return
+        if len(self.queue) >= self.max_queue:
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(item)
+        self.ready.set()
+
 class WebSocketManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(self, max_queue: int = WS_SEND_QUEUE_SIZE, send_timeout: float = WS_SEND_TIMEOUT):
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.topics: Dict[str, set] = {}  # "workflow:<id>" / "conversation:<id>" -> subscribed clients
         self.workflow_status: Dict[str, Dict] = {}
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.timed_out_clients = 0
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.clients.keys())
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = ClientConnection(websocket, self.max_queue)
+        client.task = asyncio.create_task(self._drain(client))
+        self.clients[websocket] = client
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        for topic in list(client.topics):
+            self._remove_subscriber(topic, client)
+        if client.task and client.task is not asyncio.current_task():
+            client.task.cancel()
+
+    @staticmethod
+    def topics_for(workflow_id: Optional[str] = None, conversation_id: Optional[str] = None) -> List[str]:
+        topics = []
+        if workflow_id:
+            topics.append(f"workflow:{workflow_id}")
+        if conversation_id:
+            topics.append(f"conversation:{conversation_id}")
+        return topics
+
+    def subscribe(self, websocket: WebSocket, topics: List[str]) -> List[str]:
+        client = self.clients.get(websocket)
+        if client is None:
+            return []
+        for topic in topics:
+            client.topics.add(topic)
+            self.topics.setdefault(topic, set()).add(client)
+        return sorted(client.topics)
+
+    def unsubscribe(self, websocket: WebSocket, topics: List[str]) -> List[str]:
+        client = self.clients.get(websocket)
+        if client is None:
+            return []
+        for topic in topics:
+            client.topics.discard(topic)
+            self._remove_subscriber(topic, client)
+        return sorted(client.topics)
+
+    def _remove_subscriber(self, topic: str, client: ClientConnection):
+        subscribers = self.topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(client)
+            if not subscribers:
+                del self.topics[topic]
+
+    async def _drain(self, client: ClientConnection):
+        """Per-client sender: the only place that awaits socket writes"""
+        try:
+            while True:
+                await client.ready.wait()
+                while client.queue:
+                    item = client.queue.popleft()
+                    text = item if isinstance(item, str) else item.text
+                    await asyncio.wait_for(client.websocket.send_text(text), self.send_timeout)
+                client.ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self.timed_out_clients += 1
+            await self._evict(client)
+        except Exception:
+            await self._evict(client)
+
+    async def _evict(self, client: ClientConnection):
+        """Drop a client that can't keep up and close its socket so the browser reconnects"""
+        self.disconnect(client.websocket)
+        try:
+            # 1013 "try again later": the peer is healthy enough to retry
+            await asyncio.wait_for(client.websocket.close(code=1013), self.send_timeout)
+        except Exception:
+            pass
+
+    def is_connected(self, websocket: WebSocket) -> bool:
+        return websocket in self.clients
+
+    def _publish(self, payload: Dict[str, Any], topics: List[str]):
+        """Serialize once and queue for the topic's subscribers plus unsubscribed (firehose) clients"""
+        event = OutboundEvent(payload)
+        recipients = {client for client in self.clients.values() if not client.topics}
+        for topic in topics:
+            recipients.update(self.topics.get(topic, ()))
+        for client in recipients:
+            client.enqueue(event)
 
     async def broadcast(self, message: str):
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                disconnected.append(connection)
-        
-        for connection in disconnected:
-            self.disconnect(connection)
+        """Queue a message for every client; returns without waiting for delivery"""
+        for client in list(self.clients.values()):
+            client.enqueue(message)
 
-    async def send_agent_message(self, from_agent: str, to_agent: str, content: str, message_type: str = "message"):
+    async def send_personal_message(self, message: str, websocket: WebSocket):
+        client = self.clients.get(websocket)
+        if client:
+            client.enqueue(message)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": len(self.clients),
+            "queued": sum(len(client.queue) for client in self.clients.values()),
+            "dropped": sum(client.dropped for client in self.clients.values()),
+            "coalesced": sum(client.coalesced for client in self.clients.values()),
+            "timed_out_clients": self.timed_out_clients,
+            "topics": len(self.topics),
+            "firehose_clients": sum(1 for client in self.clients.values() if not client.topics)
+        }
+
+    async def send_agent_message(self, from_agent: str, to_agent: str, content: str, message_type: str = "message",
+                                 workflow_id: Optional[str] = None, conversation_id: Optional[str] = None):
         message = {
             "type": "agent_message",
+            "workflow_id": workflow_id,
+            "conversation_id": conversation_id,
             "from_agent": from_agent,
             "to_agent": to_agent,
             "content": content,
             "message_type": message_type,
             "timestamp": datetime.now().isoformat()
         }
-        await self.broadcast(json.dumps(message))
+        self._publish(message, self.topics_for(workflow_id, conversation_id))
 
-    async def send_workflow_status(self, workflow_id: str, status: str, agents: Dict = None, message_history: List = None):
+    async def send_agent_token(self, workflow_id: Optional[str], agent_id: str, content: str,
+                               conversation_id: Optional[str] = None):
+        message = {
+            "type": "agent_token",
+            "workflow_id": workflow_id,
+            "conversation_id": conversation_id,
+            "agent_id": agent_id,
+            "content": content,
+            "timestamp": datetime.now().isoformat()
+        }
+        self._publish(message, self.topics_for(workflow_id, conversation_id))
+
+    async def send_workflow_status(self, workflow_id: str, status: str, agents: Dict = None, message_history: List = None,
+                                   conversation_id: Optional[str] = None):
         message = {
             "type": "workflow_status",
             "workflow_id": workflow_id,
+            "conversation_id": conversation_id,
             "status": status,
             "agents": agents or {},
             "message_history": message_history or [],
             "timestamp": datetime.now().isoformat()
         }
-        await self.broadcast(json.dumps(message))
+        self._publish(message, self.topics_for(workflow_id, conversation_id))
 
 websocket_manager = WebSocketManager()
 
@@ -1354,8 +2121,11 @@ websocket_manager = WebSocketManager()
 async def websocket_endpoint(websocket: WebSocket):
     await websocket_manager.connect(websocket)
     try:
-        while True:
+        while websocket_manager.is_connected(websocket):
             data = await websocket.receive_text()
+            if not websocket_manager.is_connected(websocket):
+                # Evicted while we were waiting for input; replies would be dropped
+                break
             try:
                 message = json.loads(data)
                 
@@ -1364,6 +2134,17 @@ async def websocket_endpoint(websocket: WebSocket):
                         json.dumps({"type": "test_response", "message": "WebSocket working!"}),
                         websocket
                     )
+                elif message.get("type") in ("subscribe", "unsubscribe"):
+                    # {"type": "subscribe", "workflow_id": "...", "conversation_id": "..."}
+                    topics = websocket_manager.topics_for(message.get("workflow_id"), message.get("conversation_id"))
+                    if message["type"] == "subscribe":
+                        subscribed = websocket_manager.subscribe(websocket, topics)
+                    else:
+                        subscribed = websocket_manager.unsubscribe(websocket, topics)
+                    await websocket_manager.send_personal_message(
+                        json.dumps({"type": "subscriptions", "topics": subscribed}),
+                        websocket
+                    )
             except json.JSONDecodeError:
                 pass
                 
@@ -1392,7 +2173,8 @@ async def github_quick_push(repo_name: str, commit_message: str = None):
         if not enhanced_github_agent.is_configured():
             raise HTTPException(status_code=400, detail="GitHub not configured")
         
-        result = enhanced_github_agent.extract_and_push_code(
+        result = await asyncio.to_thread(
+            enhanced_github_agent.extract_and_push_code,
             repo_name=repo_name,
             commit_message=commit_message or f"Quick push from LilySmokes - {datetime.now().strftime('%Y-%m-%d %H:%M')}",
             auto_create_repo=True
@@ -1406,6 +2188,25 @@ async def github_quick_push(repo_name: str, commit_message: str = None):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# =============================================================================
+# LIFECYCLE
+# =============================================================================
+
+@app.on_event("startup")
+async def on_startup():
+    # Pre-spawn test runner workers off the event loop
+    await asyncio.get_running_loop().run_in_executor(None, runner_pool.start)
+    # Index files from before the artifact manifest, then apply retention
+    await asyncio.to_thread(artifact_store.import_existing)
+    await asyncio.to_thread(artifact_store.gc)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await job_queue.shutdown()
+    runner_pool.shutdown()
+    artifact_store.close()
+    await db_integration.close()
+
 # =============================================================================
 # STARTUP MESSAGE
 # =============================================================================
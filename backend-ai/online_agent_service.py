@@ -28,7 +28,7 @@ try:
 except ImportError:
     GEMINI_AVAILABLE = False
     print("Warning: Gemini integration not available. Install with: pip install langchain-google-genai google-generativeai")
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
 from langchain_core.runnables import RunnableWithMessageHistory
 from langchain_core.prompts import PromptTemplate
 from langchain.callbacks import StreamingStdOutCallbackHandler
@@ -37,6 +37,10 @@ from langchain.callbacks.manager import CallbackManager
 # Database integration (reusing existing structure)
 from database import SafeDatabaseIntegration, ConversationRequest, ConversationResponse
 
+# DAG execution for explicitly connected agents
+from flow_graph import FlowGraphError, FlowPlan, compile_flow, execute_flow
+from job_queue import JobQueue
+
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
@@ -113,6 +117,13 @@ ONLINE_MODEL_CONFIGS = {
 # Default model
 DEFAULT_ONLINE_MODEL = "gemini-pro" if GEMINI_AVAILABLE else "mistral-small"
 
+# Max concurrent calls per provider when connected agents run in parallel
+PROVIDER_CONCURRENCY = {
+    "openai": int(os.getenv("OPENAI_MAX_CONCURRENCY", "4")),
+    "mistral": int(os.getenv("MISTRAL_MAX_CONCURRENCY", "2")),
+    "gemini": int(os.getenv("GEMINI_MAX_CONCURRENCY", "2"))
+}
+
 # =============================================================================
 # DATA MODELS
 # =============================================================================
@@ -157,12 +168,21 @@ class OnlineAgentStatus(Enum):
     COMPLETED = "completed"
     ERROR = "error"
 
+class OnlineAgentConnection(BaseModel):
+    """Directed edge between two agents (same shape as the canvas connections)"""
+    id: Optional[str] = None
+    fromId: str
+    toId: str
+    fromSide: Optional[str] = None
+    toSide: Optional[str] = None
+
 class OnlineWorkflowRequest(BaseModel):
     """Request for running online agent workflow"""
     task: str
     agents: List[OnlineAgent]
     conversation_id: Optional[str] = None
     enable_streaming: bool = True
+    connections: List[OnlineAgentConnection] = []  # When given, agents run as a DAG instead of round-robin
 
 class OnlineWorkflowResponse(BaseModel):
     """Response from online agent workflow"""
@@ -173,6 +193,96 @@ class OnlineWorkflowResponse(BaseModel):
     total_messages: int
     conversation_id: str
 
+# =============================================================================
+# CONVERSATION MEMORY POLICY
+# =============================================================================
+
+# Ceiling on the estimated tokens sent per agent call (system prompt + summary
+# + history + current message). Raw turns beyond it are folded into a rolling summary.
+ONLINE_MAX_PROMPT_TOKENS = int(os.getenv("ONLINE_MAX_PROMPT_TOKENS", "3000"))
+ONLINE_SUMMARY_MAX_TOKENS = int(os.getenv("ONLINE_SUMMARY_MAX_TOKENS", "400"))
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token)"""
+    return max(1, len(text) // 4)
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars] + "\n...[truncated]"
+
+class ConversationMemory:
+    """Token-budgeted sliding window over workflow turns with a rolling summary"""
+    
+    def __init__(self, conversation_id: str, max_prompt_tokens: int = ONLINE_MAX_PROMPT_TOKENS,
+                 summary_max_tokens: int = ONLINE_SUMMARY_MAX_TOKENS):
+        self.conversation_id = conversation_id
+        self.max_prompt_tokens = max_prompt_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.turns: List[Dict[str, Any]] = []
+        self.summary_lines: List[str] = []
+        self.retained_tokens = 0
+    
+    @property
+    def summary(self) -> str:
+        return "\n".join(self.summary_lines)
+    
+    def record(self, agent_id: str, agent_name: str, prompt: str, response: str):
+        """Store a turn, folding the oldest turns into the summary once over budget"""
+        tokens = estimate_tokens(prompt) + estimate_tokens(response)
+        self.turns.append({
+            "agent_id": agent_id,
+            "agent_name": agent_name,
+            "prompt": prompt,
+            "response": response,
+            "tokens": tokens
+        })
+        self.retained_tokens += tokens
+        while len(self.turns) > 1 and self.retained_tokens > self.max_prompt_tokens:
+            self._evict(self.turns.pop(0))
+    
+    def _evict(self, turn: Dict[str, Any]):
+        self.retained_tokens -= turn["tokens"]
+        first_line = next((line.strip() for line in turn["response"].splitlines() if line.strip()), "")
+        self.summary_lines.append(f"- {turn['agent_name']}: {first_line[:160]}")
+        while len(self.summary_lines) > 1 and estimate_tokens(self.summary) > self.summary_max_tokens:
+            self.summary_lines.pop(0)
+    
+    def build_messages(self, agent_id: str, system_content: str, current_content: str) -> List[BaseMessage]:
+        """Per-agent prompt: the agent's own exchanges verbatim, other agents' replies
+        as context, newest first until the token ceiling is reached"""
+        budget = self.max_prompt_tokens - estimate_tokens(system_content)
+        current_content = _truncate_to_tokens(current_content, max(budget // 2, 1))
+        budget -= estimate_tokens(current_content)
+        
+        messages: List[BaseMessage] = [SystemMessage(content=system_content)]
+        if self.summary_lines and budget > 0:
+            summary_message = SystemMessage(content=f"Summary of earlier conversation:\n{self.summary}")
+            messages.append(summary_message)
+            budget -= estimate_tokens(summary_message.content)
+        
+        history: List[List[BaseMessage]] = []
+        for turn in reversed(self.turns):
+            # The latest reply is usually already quoted in the current message
+            if turn["response"] and turn["response"] in current_content:
+                continue
+            if turn["agent_id"] == agent_id:
+                block = [HumanMessage(content=turn["prompt"]), AIMessage(content=turn["response"])]
+                cost = turn["tokens"]
+            else:
+                block = [HumanMessage(content=f"{turn['agent_name']} responded: {turn['response']}")]
+                cost = estimate_tokens(turn["response"])
+            if cost > budget:
+                break
+            history.append(block)
+            budget -= cost
+        
+        for block in reversed(history):
+            messages.extend(block)
+        messages.append(HumanMessage(content=current_content))
+        return messages
+
 # =============================================================================
 # LANGCHAIN AGENT MANAGER
 # =============================================================================
@@ -182,7 +292,7 @@ class LangChainAgentManager:
     
     def __init__(self):
         self.agents: Dict[str, 'OnlineAgentInstance'] = {}
-        self.conversations: Dict[str, Dict[str, Any]] = {}
+        self.conversations: Dict[str, ConversationMemory] = {}
         self.workflow_history: Dict[str, List[OnlineAgentMessage]] = {}
         
     def create_agent(self, agent_config: OnlineAgent) -> 'OnlineAgentInstance':
@@ -195,12 +305,9 @@ class LangChainAgentManager:
         """Get agent by ID"""
         return self.agents.get(agent_id)
     
-    def create_conversation_memory(self, conversation_id: str) -> Dict[str, Any]:
+    def create_conversation_memory(self, conversation_id: str) -> ConversationMemory:
         """Create conversation memory for tracking"""
-        memory = {
-            "messages": [],
-            "conversation_id": conversation_id
-        }
+        memory = ConversationMemory(conversation_id)
         self.conversations[conversation_id] = memory
         return memory
     
@@ -271,7 +378,7 @@ class OnlineAgentInstance:
         else:
             raise ValueError(f"Unsupported provider: {model_config['provider']}")
     
-    async def process_message(self, message: OnlineAgentMessage, conversation_memory: Optional[Dict[str, Any]] = None) -> str:
+    async def process_message(self, message: OnlineAgentMessage, conversation_memory: Optional[ConversationMemory] = None) -> str:
         """Process incoming message and return response"""
         try:
             self.status = OnlineAgentStatus.WORKING
@@ -290,28 +397,21 @@ class OnlineAgentInstance:
             """
             
             system_content = f"You are {self.config.name}, a {self.config.role}. {self.config.system_prompt}\n\n{coordination_instructions}"
-            
-            # Create messages for LangChain
-            messages = [SystemMessage(content=system_content)]
-            
-            # Add conversation history if available
-            if conversation_memory and "messages" in conversation_memory:
-                messages.extend(conversation_memory["messages"])
-            
-            # Add current message with context
             message_context = f"Message from {message.from_agent}: {message.content}"
-            messages.append(HumanMessage(content=message_context))
+            
+            # Only the history this agent needs, within the prompt token ceiling
+            if conversation_memory and self.config.memory_enabled:
+                messages = conversation_memory.build_messages(self.config.id, system_content, message_context)
+            else:
+                messages = [SystemMessage(content=system_content), HumanMessage(content=message_context)]
             
             # Get response from LLM
             response = await self.llm.agenerate([messages])
             response_content = response.generations[0][0].text
             
             # Add to memory
-            if conversation_memory and "messages" in conversation_memory:
-                conversation_memory["messages"].extend([
-                    HumanMessage(content=message_context),
-                    AIMessage(content=response_content)
-                ])
+            if conversation_memory:
+                conversation_memory.record(self.config.id, self.config.name, message_context, response_content)
             
             self.status = OnlineAgentStatus.COMPLETED
             return response_content
@@ -336,10 +436,37 @@ class OnlineWorkflowManager:
         self.agent_manager = LangChainAgentManager()
         self.active_workflows: Dict[str, Dict[str, Any]] = {}
         self.db_integration = SafeDatabaseIntegration()
+        self.provider_limits: Dict[str, asyncio.Semaphore] = {}
     
-    async def run_workflow(self, request: OnlineWorkflowRequest) -> OnlineWorkflowResponse:
-        """Run a complete workflow with online agents"""
+    def _provider_limit(self, agent: 'OnlineAgentInstance') -> asyncio.Semaphore:
+        provider = ONLINE_MODEL_CONFIGS.get(agent.config.model, ONLINE_MODEL_CONFIGS[DEFAULT_ONLINE_MODEL])["provider"]
+        if provider not in self.provider_limits:
+            self.provider_limits[provider] = asyncio.Semaphore(PROVIDER_CONCURRENCY.get(provider, 2))
+        return self.provider_limits[provider]
+    
+    def queue_workflow(self, request: OnlineWorkflowRequest) -> str:
+        """Register a workflow as queued and hand it to the background job queue"""
         workflow_id = f"workflow_{datetime.now().timestamp()}"
+        self.active_workflows[workflow_id] = {
+            "status": "queued",
+            "agents": {},
+            "message_history": [],
+            "conversation_id": request.conversation_id
+        }
+        job_queue.submit("online_workflow", lambda: self.run_workflow(request, workflow_id), job_id=workflow_id,
+                         metadata={"task": request.task})
+        return workflow_id
+    
+    def cancel_workflow(self, workflow_id: str) -> bool:
+        """Cancel a queued or running background workflow; in-flight provider calls are cancelled with it"""
+        if not job_queue.cancel(workflow_id):
+            return False
+        self.active_workflows[workflow_id]["status"] = "cancelled"
+        return True
+    
+    async def run_workflow(self, request: OnlineWorkflowRequest, workflow_id: Optional[str] = None) -> OnlineWorkflowResponse:
+        """Run a complete workflow with online agents"""
+        workflow_id = workflow_id or f"workflow_{datetime.now().timestamp()}"
         
         # Create conversation if needed (only for non-manual flows)
         conversation_id = request.conversation_id
@@ -368,6 +495,12 @@ class OnlineWorkflowManager:
         
         # Start workflow execution
         try:
+            if request.connections:
+                plan = compile_flow(agents.keys(), [(c.fromId, c.toId) for c in request.connections])
+                await self._execute_graph(workflow_id, agents, plan, request.task, conversation_id, conversation_memory)
+                self.active_workflows[workflow_id]["status"] = "completed"
+                return self._build_response(workflow_id, agents, conversation_id)
+            
             # Find coordinator agent or use first agent
             coordinator = next((agent for agent in agents.values() if "coordinator" in agent.config.role.lower()), 
                              list(agents.values())[0])
@@ -387,11 +520,17 @@ class OnlineWorkflowManager:
             # Update final status
             self.active_workflows[workflow_id]["status"] = "completed"
             
+        except asyncio.CancelledError:
+            self.active_workflows[workflow_id]["status"] = "cancelled"
+            raise
         except Exception as e:
             self.active_workflows[workflow_id]["status"] = "error"
             logging.error(f"Workflow error: {str(e)}")
         
         # Return response
+        return self._build_response(workflow_id, agents, conversation_id)
+    
+    def _build_response(self, workflow_id: str, agents: Dict[str, 'OnlineAgentInstance'], conversation_id: str) -> OnlineWorkflowResponse:
         return OnlineWorkflowResponse(
             workflow_id=workflow_id,
             status=self.active_workflows[workflow_id]["status"],
@@ -401,8 +540,66 @@ class OnlineWorkflowManager:
             conversation_id=conversation_id
         )
     
+    async def _record_message(self, workflow_id: str, message: OnlineAgentMessage):
+        """Add message to workflow history and queue it for the database"""
+        self.active_workflows[workflow_id]["message_history"].append(message)
+        self.agent_manager.add_message_to_history(workflow_id, message)
+        
+        # Save to database (only for non-manual workflows)
+        if not message.conversation_id.startswith("manual_workflow_"):
+            await self.db_integration.add_message_to_conversation(
+                message.conversation_id,
+                message.from_agent,
+                message.to_agent,
+                message.message_type.value,
+                message.content,
+                message.metadata
+            )
+    
+    async def _execute_graph(self, workflow_id: str, agents: Dict[str, 'OnlineAgentInstance'], plan: FlowPlan,
+                             task: str, conversation_id: str, conversation_memory: 'ConversationMemory'):
+        """Run connected agents as a DAG: ready agents run concurrently and join their inputs"""
+        workflow = self.active_workflows[workflow_id]
+        
+        async def run_agent(agent_id: str, inputs: Dict[str, str]) -> str:
+            if inputs:
+                upstream = "\n\n".join(f"Output from {pred}:\n{output}" for pred, output in inputs.items())
+                message = OnlineAgentMessage(
+                    from_agent=",".join(inputs.keys()),
+                    to_agent=agent_id,
+                    message_type=MessageType.COORDINATION,
+                    content=f"Overall task: {task}\n\n{upstream}",
+                    conversation_id=conversation_id
+                )
+            else:
+                message = OnlineAgentMessage(
+                    from_agent="system",
+                    to_agent=agent_id,
+                    message_type=MessageType.TASK,
+                    content=task,
+                    conversation_id=conversation_id
+                )
+            await self._record_message(workflow_id, message)
+            
+            workflow["agents"][agent_id] = OnlineAgentStatus.WORKING
+            response_content = await agents[agent_id].process_message(message, conversation_memory)
+            workflow["agents"][agent_id] = agents[agent_id].get_status()
+            return response_content
+        
+        outputs = await execute_flow(plan, run_agent, limiter=lambda agent_id: self._provider_limit(agents[agent_id]))
+        
+        # Join: the terminal agents' outputs are the workflow result
+        for agent_id in plan.exit_nodes:
+            await self._record_message(workflow_id, OnlineAgentMessage(
+                from_agent=agent_id,
+                to_agent="system",
+                message_type=MessageType.RESPONSE,
+                content=outputs[agent_id],
+                conversation_id=conversation_id
+            ))
+    
     async def _execute_workflow(self, workflow_id: str, agents: Dict[str, OnlineAgentInstance], 
-                              initial_message: OnlineAgentMessage, conversation_memory: Dict[str, Any]):
+                              initial_message: OnlineAgentMessage, conversation_memory: ConversationMemory):
         """Execute the workflow step by step with multi-agent coordination"""
         current_message = initial_message
         max_iterations = 20
@@ -410,20 +607,8 @@ class OnlineWorkflowManager:
         agent_roles = {agent_id: agent.config.role.lower() for agent_id, agent in agents.items()}
         
         while iteration < max_iterations:
-            # Add message to history
-            self.active_workflows[workflow_id]["message_history"].append(current_message)
-            self.agent_manager.add_message_to_history(workflow_id, current_message)
-            
-            # Save to database (only for non-manual workflows)
-            if not current_message.conversation_id.startswith("manual_workflow_"):
-                await self.db_integration.add_message_to_conversation(
-                    current_message.conversation_id,
-                    current_message.from_agent,
-                    current_message.to_agent,
-                    current_message.message_type.value,
-                    current_message.content,
-                    current_message.metadata
-                )
+            # Add message to history and database
+            await self._record_message(workflow_id, current_message)
             
             # Get target agent
             target_agent = agents.get(current_message.to_agent)
@@ -482,6 +667,10 @@ online_app.add_middleware(
     allow_headers=["*"],
 )
 
+# Background workflow jobs (/run-workflow?background=true)
+ONLINE_JOB_CONCURRENCY = int(os.getenv("ONLINE_JOB_CONCURRENCY", "4"))
+job_queue = JobQueue(concurrency=ONLINE_JOB_CONCURRENCY)
+
 # Initialize workflow manager
 workflow_manager = OnlineWorkflowManager()
 
@@ -501,7 +690,8 @@ async def root():
             "models": "/models",
             "workflow": "/run-workflow",
             "conversations": "/conversations",
-            "workflow-status": "/workflow-status/{workflow_id}"
+            "workflow-status": "/workflow-status/{workflow_id}",
+            "cancel-workflow": "/workflow-status/{workflow_id}/cancel"
         }
     }
 
@@ -512,7 +702,8 @@ async def health_check():
         "status": "healthy",
         "service": "online_agent_service",
         "timestamp": datetime.now().isoformat(),
-        "available_models": list(ONLINE_MODEL_CONFIGS.keys())
+        "available_models": list(ONLINE_MODEL_CONFIGS.keys()),
+        "jobs": job_queue.stats()
     }
 
 @online_app.get("/models")
@@ -529,8 +720,8 @@ async def get_online_models():
     }
 
 @online_app.post("/run-workflow")
-async def run_online_workflow(request: OnlineWorkflowRequest):
-    """Run online agent workflow"""
+async def run_online_workflow(request: OnlineWorkflowRequest, background: bool = False):
+    """Run online agent workflow; background=true queues it and returns the workflow id at once"""
     # Validate request
     if not request.task or not request.task.strip():
         raise HTTPException(status_code=422, detail="Task cannot be empty")
@@ -538,6 +729,12 @@ async def run_online_workflow(request: OnlineWorkflowRequest):
     if not request.agents or len(request.agents) == 0:
         raise HTTPException(status_code=422, detail="At least one agent must be specified")
     
+    if request.connections:
+        try:
+            compile_flow([agent.id for agent in request.agents], [(c.fromId, c.toId) for c in request.connections])
+        except FlowGraphError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    
     # Check if required API keys are available
     required_providers = set()
     for agent in request.agents:
@@ -558,6 +755,10 @@ async def run_online_workflow(request: OnlineWorkflowRequest):
             detail=f"Missing required API keys: {', '.join(missing_keys)}. Please set the environment variables."
         )
     
+    if background:
+        workflow_id = workflow_manager.queue_workflow(request)
+        return {"workflow_id": workflow_id, "status": "queued", "status_url": f"/workflow-status/{workflow_id}"}
+    
     try:
         response = await workflow_manager.run_workflow(request)
         return response
@@ -571,18 +772,41 @@ async def get_workflow_status(workflow_id: str):
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
-    return {
+    status = {
         "workflow_id": workflow_id,
         "status": workflow["status"],
         "agents": workflow["agents"],
         "message_count": len(workflow["message_history"]),
         "conversation_id": workflow["conversation_id"]
     }
+    job = job_queue.get(workflow_id)
+    if job is not None:
+        # Background runs: queue/run timings, and the full response once finished
+        status["job"] = job.to_dict(include_result=False)
+        if job.status == "failed":
+            status["status"] = "error"
+            status["error"] = job.error
+        if job.status == "completed":
+            status["result"] = job.result
+    return status
+
+@online_app.post("/workflow-status/{workflow_id}/cancel")
+async def cancel_workflow(workflow_id: str):
+    """Cancel a background workflow"""
+    workflow = workflow_manager.active_workflows.get(workflow_id)
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    if job_queue.get(workflow_id) is None:
+        raise HTTPException(status_code=409, detail="Only workflows started with background=true can be cancelled")
+    if not workflow_manager.cancel_workflow(workflow_id):
+        raise HTTPException(status_code=409, detail=f"Workflow is already {workflow['status']}")
+    return {"workflow_id": workflow_id, "status": "cancelled"}
 
 @online_app.get("/conversations")
 async def get_online_conversations():
     """Get conversation history"""
     try:
+        await workflow_manager.db_integration.flush()
         conversations = await workflow_manager.db_integration.get_conversations()
         return [
             ConversationResponse(
@@ -601,11 +825,12 @@ async def get_online_conversations():
 async def get_online_conversation(conversation_id: str):
     """Get specific conversation"""
     try:
+        await workflow_manager.db_integration.flush()
         conversation = await workflow_manager.db_integration.get_conversation(conversation_id)
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
         
-        messages = workflow_manager.db_integration.db_service.get_conversation_messages(conversation_id)
+        messages = await workflow_manager.db_integration.get_conversation_messages(conversation_id)
         return {
             "conversation": {
                 "id": conversation.id,
@@ -632,6 +857,12 @@ async def get_online_conversation(conversation_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get conversation: {str(e)}")
 
+@online_app.on_event("shutdown")
+async def on_shutdown():
+    """Cancel background workflows and flush queued message writes before exiting"""
+    await job_queue.shutdown()
+    await workflow_manager.db_integration.close()
+
 # =============================================================================
 # STARTUP
 # =============================================================================
@@ -0,0 +1,264 @@
+"""
+Task planning for the coordinator agent
+Everyday "write a function" prompts get a rule-based plan without touching
+the model, plans are cached by prompt signature, and JSON plans returned by
+the model are validated against a typed schema - either tolerantly after the
+fact (code fences, leading prose, trailing text) or step by step while the
+plan is still streaming
+"""
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ValidationError, field_validator
+
+from completion_cache import normalize_prompt
+
+PLANNABLE_AGENTS = ("coder", "tester", "runner", "github", "enhanced_github")
+
+CODE_TASK_PATTERN = re.compile(
+    r"\b(write|create|implement|generate|build|make|code|add)\b.{0,80}?"
+    r"\b(function|functions|class|classes|method|script|program|algorithm|module|decorator|parser|api|code)\b",
+    re.IGNORECASE | re.DOTALL
+)
+GITHUB_TASK_PATTERN = re.compile(r"\b(github|repo|repository|push)\b", re.IGNORECASE)
+
+
+class PlanStep(BaseModel):
+    agent: str
+    task: str
+    priority: int = 1
+
+    @field_validator("agent")
+    @classmethod
+    def known_agent(cls, value: str) -> str:
+        value = value.strip().lower()
+        if value not in PLANNABLE_AGENTS:
+            raise ValueError(f"unknown agent '{value}'")
+        return value
+
+    @field_validator("task")
+    @classmethod
+    def non_empty_task(cls, value: str) -> str:
+        if not value.strip():
+            raise ValueError("empty task")
+        return value.strip()
+
+
+class CoordinatorPlan(BaseModel):
+    steps: List[PlanStep]
+
+
+# Included in the coordinator prompt; Ollama's JSON mode keeps the output parseable
+PLAN_JSON_SCHEMA = json.dumps(CoordinatorPlan.model_json_schema())
+
+
+def default_plan(task: str) -> List[Dict[str, Any]]:
+    """The coder -> tester plan every run used to fall back to"""
+    return [
+        {"agent": "coder", "task": task, "priority": 1},
+        {"agent": "tester", "task": "Create tests for the generated code", "priority": 2}
+    ]
+
+
+def rule_based_plan(task: str) -> Optional[List[Dict[str, Any]]]:
+    """Plan plain code-writing prompts directly; None means the model should plan"""
+    if GITHUB_TASK_PATTERN.search(task):
+        return None
+    if CODE_TASK_PATTERN.search(task):
+        return default_plan(task)
+    return None
+
+
+def prompt_signature(task: str) -> str:
+    return hashlib.sha256(normalize_prompt(task).lower().encode("utf-8")).hexdigest()
+
+
+def extract_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """Return the first JSON object in a model response, ignoring fences and surrounding prose"""
+    if not text:
+        return None
+    cleaned = re.sub(r"```(?:json)?", "", text).strip()
+    try:
+        value = json.loads(cleaned)
+        return value if isinstance(value, dict) else {"steps": value} if isinstance(value, list) else None
+    except ValueError:
+        pass
+
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r"\{", cleaned):
+        try:
+            value, _ = decoder.raw_decode(cleaned, match.start())
+        except ValueError:
+            continue
+        if isinstance(value, dict):
+            return value
+    return None
+
+
+def parse_step(raw: Any) -> Optional[Dict[str, Any]]:
+    try:
+        return PlanStep.model_validate(raw).model_dump()
+    except ValidationError:
+        return None
+
+
+def validate_steps(plan: Optional[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """Keep schema-valid steps; None if nothing usable is left"""
+    if not plan or not isinstance(plan.get("steps"), list):
+        return None
+    steps = []
+    for index, raw in enumerate(plan["steps"]):
+        if isinstance(raw, dict):
+            raw = {"priority": index + 1, **raw}
+        step = parse_step(raw)
+        if step is not None:
+            steps.append(step)
+    return sorted(steps, key=lambda step: step["priority"]) or None
+
+
+class IncrementalPlanParser:
+    """Feed streamed chunks of a {"steps": [...]} document; each step is returned as soon as its object closes"""
+
+    def __init__(self):
+        self.buffer = ""
+        self.steps: List[Dict[str, Any]] = []
+        self.rejected = 0
+        self._pos = 0
+        self._in_steps = False
+        self._depth = 0
+        self._start = -1
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self.buffer += chunk
+        completed = []
+        if not self._in_steps:
+            match = re.search(r'"steps"\s*:\s*\[', self.buffer)
+            if not match:
+                return completed
+            self._in_steps = True
+            self._pos = match.end()
+
+        while self._pos < len(self.buffer):
+            char = self.buffer[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._start = self._pos
+                self._depth += 1
+            elif char == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    step = self._accept(self.buffer[self._start:self._pos + 1])
+                    if step is not None:
+                        completed.append(step)
+            self._pos += 1
+        return completed
+
+    def _accept(self, fragment: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = json.loads(fragment)
+        except ValueError:
+            raw = None
+        if isinstance(raw, dict):
+            raw = {"priority": len(self.steps) + 1, **raw}
+        step = parse_step(raw)
+        if step is None:
+            self.rejected += 1
+            return None
+        self.steps.append(step)
+        return step
+
+
+class TaskPlanner:
+    """Rule-based planner + LRU plan cache in front of the coordinator's LLM"""
+
+    def __init__(self, max_entries: int = 256, rules_enabled: bool = True):
+        self.max_entries = max_entries
+        self.rules_enabled = rules_enabled
+        self._plans: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.rule_plans = 0
+        self.cache_hits = 0
+        self.llm_plans = 0
+        self.fallbacks = 0
+        self.parse_attempts = 0
+        self.rejected_steps = 0
+        self.streamed_steps = 0
+
+    def plan_without_llm(self, task: str) -> Optional[List[Dict[str, Any]]]:
+        """Cached or rule-based plan for this task, or None when the model has to plan"""
+        key = prompt_signature(task)
+        with self._lock:
+            steps = self._plans.get(key)
+            if steps is not None:
+                self._plans.move_to_end(key)
+                self.cache_hits += 1
+                return [dict(step) for step in steps]
+
+        steps = rule_based_plan(task) if self.rules_enabled else None
+        if steps is not None:
+            with self._lock:
+                self.rule_plans += 1
+            self.remember(task, steps)
+        return steps
+
+    def decode(self, task: str, response: str, streamed: Optional[IncrementalPlanParser] = None) -> List[Dict[str, Any]]:
+        """Validate the model's plan; only successfully decoded plans are cached.
+
+        When the plan was parsed while streaming, its steps win over a re-parse
+        of the full response so nothing already dispatched is planned twice.
+        """
+        steps = streamed.steps if streamed and streamed.steps else validate_steps(extract_json_object(response))
+        with self._lock:
+            self.parse_attempts += 1
+            if streamed:
+                self.rejected_steps += streamed.rejected
+                self.streamed_steps += len(streamed.steps)
+            if not steps:
+                self.fallbacks += 1
+                return default_plan(task)
+            self.llm_plans += 1
+        self.remember(task, steps)
+        return steps
+
+    def remember(self, task: str, steps: List[Dict[str, Any]]):
+        key = prompt_signature(task)
+        with self._lock:
+            self._plans[key] = [dict(step) for step in steps]
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rule_plans": self.rule_plans,
+                "cache_hits": self.cache_hits,
+                "llm_plans": self.llm_plans,
+                "fallbacks": self.fallbacks,
+                "parse_attempts": self.parse_attempts,
+                "parse_failure_rate": round(self.fallbacks / self.parse_attempts, 3) if self.parse_attempts else 0.0,
+                "rejected_steps": self.rejected_steps,
+                "streamed_steps": self.streamed_steps,
+                "cached_plans": len(self._plans),
+                "rules_enabled": self.rules_enabled
+            }
@@ -0,0 +1,397 @@
+"""
+Async test runner backed by a pool of warm worker processes
+Workers (runner_worker.py) are spawned ahead of time, take one job over a
+pipe and exit, so runs stay isolated while interpreter startup happens off
+the request path. Blocking pipe I/O runs on a dedicated thread pool.
+Results are memoized by (code, tests, interpreter) so identical runs
+execute once, and a run whose callers have all been cancelled kills its worker.
+"""
+
+import asyncio
+import copy
+import functools
+import hashlib
+import json
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from runner_worker import RESULT_MARKER
+
+WORKER_SCRIPT = Path(__file__).resolve().parent / "runner_worker.py"
+
+# Per-run sandbox limits applied by the worker before it executes a job (0 = unlimited)
+DEFAULT_LIMITS = {
+    "memory_mb": 512,
+    "cpu_seconds": 30,
+    "max_processes": 16,
+    "file_size_mb": 16
+}
+
+NETWORK_ISOLATION_PREFIX = ["unshare", "--net", "--map-root-user"]
+
+SIGNAL_REASONS = {
+    getattr(signal, "SIGXCPU", None): "CPU time limit exceeded",
+    getattr(signal, "SIGXFSZ", None): "File size limit exceeded",
+    getattr(signal, "SIGKILL", None): "Worker was killed (memory or CPU limit)",
+    getattr(signal, "SIGSEGV", None): "Worker crashed (segmentation fault)"
+}
+
+
+def network_isolation_available() -> bool:
+    """True if unprivileged network namespaces work on this host"""
+    if not shutil.which("unshare"):
+        return False
+    try:
+        return subprocess.run(NETWORK_ISOLATION_PREFIX + ["true"], capture_output=True, timeout=5).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+def _empty_report(**overrides) -> Dict[str, Any]:
+    report = {
+        "passed": False,
+        "tests_run": 0,
+        "failures": 0,
+        "errors": 0,
+        "skipped": 0,
+        "tests": [],
+        "output": "",
+        "error": None,
+        "timed_out": False,
+        "duration": 0.0,
+        "wall_time": 0.0,
+        "cpu_time": None,
+        "peak_rss": None,
+        "limit_exceeded": False,
+        "worker_completed": False
+    }
+    report.update(overrides)
+    return report
+
+
+class TestResultCache:
+    """Bounded LRU of test reports keyed by a hash of code, tests and interpreter version"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._reports: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(code: str, test_code: str, limits: Optional[Dict[str, Any]] = None) -> str:
+        payload = json.dumps([code, test_code, sys.version, limits or {}], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_cacheable(report: Dict[str, Any]) -> bool:
+        # Only reports parsed from a finished worker; timeouts and crashed workers may pass next time
+        return report.get("worker_completed", False) and not report.get("timed_out")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            report = self._reports.get(key)
+            if report is None:
+                self.misses += 1
+                return None
+            self._reports.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(report)
+
+    def put(self, key: str, report: Dict[str, Any]):
+        if not self.is_cacheable(report):
+            return
+        with self._lock:
+            self._reports[key] = copy.deepcopy(report)
+            self._reports.move_to_end(key)
+            while len(self._reports) > self.max_entries:
+                self._reports.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._reports.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._reports)
+            }
+
+
+class RunnerPool:
+    """Pool of pre-spawned, pre-imported interpreters for running generated tests"""
+
+    def __init__(self, size: int = 2, timeout: float = 30.0, result_cache: Optional[TestResultCache] = None,
+                 limits: Optional[Dict[str, Any]] = None, isolate_network: bool = False):
+        self.size = size
+        self.timeout = timeout
+        self.result_cache = result_cache
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.command = [sys.executable, "-u", str(WORKER_SCRIPT)]
+        self.network_isolated = False
+        if isolate_network:
+            if network_isolation_available():
+                self.command = NETWORK_ISOLATION_PREFIX + self.command
+                self.network_isolated = True
+            else:
+                print("⚠️ Network isolation requested but unshare is unavailable; running without it")
+        self._pending: Dict[str, Tuple[Future, str]] = {}  # cache key -> (execution, run id)
+        self._waiters: Dict[str, int] = {}  # run id -> callers awaiting it
+        self._active: Dict[str, subprocess.Popen] = {}  # run id -> worker executing it
+        self._abandoned: set = set()  # run ids cancelled before their worker was registered
+        self._idle: List[Tuple[subprocess.Popen, str]] = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(4, size * 2), thread_name_prefix="test-runner")
+        self._closed = False
+        self.runs = 0
+        self.timeouts = 0
+        self.spawned = 0
+        self.cold_starts = 0
+        self.cancelled = 0
+
+    # ------------------------------------------------------------------
+    # Worker lifecycle
+    # ------------------------------------------------------------------
+    def _spawn(self) -> Tuple[subprocess.Popen, str]:
+        workdir = tempfile.mkdtemp(prefix="runner_")
+        proc = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            cwd=workdir
+        )
+        with self._lock:
+            self.spawned += 1
+        return proc, workdir
+
+    def _acquire(self) -> Tuple[subprocess.Popen, str]:
+        with self._lock:
+            while self._idle:
+                proc, workdir = self._idle.pop()
+                if proc.poll() is None:
+                    return proc, workdir
+                shutil.rmtree(workdir, ignore_errors=True)
+            self.cold_starts += 1
+        return self._spawn()
+
+    def _replenish(self):
+        while True:
+            with self._lock:
+                if self._closed or len(self._idle) >= self.size:
+                    return
+            worker = self._spawn()
+            with self._lock:
+                if self._closed:
+                    self._discard(worker)
+                    return
+                self._idle.append(worker)
+
+    @staticmethod
+    def _discard(worker: Tuple[subprocess.Popen, str]):
+        proc, workdir = worker
+        if proc.poll() is None:
+            proc.kill()
+            proc.communicate()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    def start(self):
+        """Pre-spawn the warm workers (blocking; call from a thread at startup)"""
+        self._replenish()
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            self._discard(worker)
+        self._executor.shutdown(wait=False)
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+    def _execute(self, code: str, test_code: str, run_id: Optional[str] = None) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            proc, workdir = self._acquire()
+        except Exception as e:
+            return _empty_report(error=f"Could not start test worker: {e}")
+        self._executor.submit(self._replenish)
+        if run_id:
+            with self._lock:
+                self._active[run_id] = proc
+                if run_id in self._abandoned:
+                    proc.kill()
+
+        try:
+            payload = json.dumps({"code": code, "test_code": test_code, "limits": self.limits})
+            try:
+                stdout, stderr = proc.communicate(payload, timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                stdout, stderr = proc.communicate()
+                with self._lock:
+                    self.timeouts += 1
+                return _empty_report(
+                    timed_out=True,
+                    error=f"Tests exceeded the {self.timeout:.0f}s timeout",
+                    output=(stdout or "") + (stderr or ""),
+                    duration=round(time.perf_counter() - started, 6),
+                    wall_time=round(time.perf_counter() - started, 6)
+                )
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+            with self._lock:
+                self.runs += 1
+                self._active.pop(run_id, None)
+                self._abandoned.discard(run_id)
+
+        marker = stdout.rfind(RESULT_MARKER)
+        if marker == -1:
+            reason = SIGNAL_REASONS.get(-proc.returncode) if proc.returncode and proc.returncode < 0 else None
+            return _empty_report(
+                error=reason or f"Test worker exited with code {proc.returncode} before reporting results",
+                limit_exceeded=reason is not None and "limit" in reason,
+                output=(stdout or "") + (stderr or ""),
+                duration=round(time.perf_counter() - started, 6),
+                wall_time=round(time.perf_counter() - started, 6)
+            )
+
+        report = json.loads(stdout[marker + len(RESULT_MARKER):].strip())
+        stray_output = (stdout[:marker].strip() + "\n" + (stderr or "")).strip()
+        if stray_output:
+            report["output"] = (report.get("output", "") + "\n" + stray_output).strip()
+        report["wall_time"] = round(time.perf_counter() - started, 6)
+        report["worker_completed"] = True
+        messages = [report.get("error") or ""] + [test.get("message") or "" for test in report.get("tests", [])]
+        report["limit_exceeded"] = any("MemoryError" in message or "File too large" in message for message in messages)
+        return report
+
+    def _execute_and_cache(self, key: str, run_id: str, code: str, test_code: str) -> Dict[str, Any]:
+        report = self._execute(code, test_code, run_id)
+        self.result_cache.put(key, report)
+        return report
+
+    def _forget_pending(self, key: str, future: Future):
+        # Only drop our own entry; a resubmission after a cancel may have replaced it
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None and pending[0] is future:
+                del self._pending[key]
+
+    async def run(self, code: str, test_code: str) -> Dict[str, Any]:
+        """Run tests against code in an isolated worker without blocking the event loop"""
+        if self.result_cache is None:
+            run_id = uuid.uuid4().hex
+            with self._lock:
+                future = self._executor.submit(self._execute, code, test_code, run_id)
+                self._waiters[run_id] = 1
+            return await self._wait(run_id, future)
+
+        key = TestResultCache.make_key(code, test_code, self.limits)
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            cached["cached"] = True
+            return cached
+
+        # Identical runs already in flight share one execution
+        created = False
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                run_id = uuid.uuid4().hex
+                pending = (self._executor.submit(self._execute_and_cache, key, run_id, code, test_code), run_id)
+                self._pending[key] = pending
+                created = True
+            future, run_id = pending
+            self._waiters[run_id] = self._waiters.get(run_id, 0) + 1
+        if created:
+            # Outside the lock: the callback runs immediately if the run already finished
+            future.add_done_callback(functools.partial(self._forget_pending, key))
+        return copy.deepcopy(await self._wait(run_id, future, key))
+
+    async def _wait(self, run_id: str, future: Future, key: Optional[str] = None) -> Dict[str, Any]:
+        """Await a run; when the last caller is cancelled, drop the queued job or kill its worker"""
+        try:
+            # Shielded so one cancelled caller doesn't cancel a run other callers still share
+            return await asyncio.shield(asyncio.wrap_future(future))
+        finally:
+            proc = None
+            with self._lock:
+                self._waiters[run_id] -= 1
+                abandoned = self._waiters[run_id] == 0 and not future.done()
+                if self._waiters[run_id] == 0:
+                    del self._waiters[run_id]
+                if abandoned:
+                    self.cancelled += 1
+                    proc = self._active.get(run_id)
+                    if proc is None:
+                        self._abandoned.add(run_id)
+            if abandoned:
+                # Done callbacks (_forget_pending) take the lock, so cancel outside it
+                future.cancel()
+                if key is not None:
+                    # A killed run must not be joined by new callers before its worker exits
+                    self._forget_pending(key, future)
+                if proc is not None and proc.poll() is None:
+                    proc.kill()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pool_size": self.size,
+                "idle_workers": len(self._idle),
+                "runs": self.runs,
+                "timeouts": self.timeouts,
+                "spawned": self.spawned,
+                "cold_starts": self.cold_starts,
+                "cancelled": self.cancelled,
+                "limits": self.limits,
+                "network_isolated": self.network_isolated,
+                "result_cache": self.result_cache.stats() if self.result_cache else {"enabled": False}
+            }
+
+
+def format_test_report(report: Dict[str, Any]) -> str:
+    """Human-readable summary in the same shape the agents have always returned"""
+    if report.get("timed_out"):
+        return "❌ TESTS TIMEOUT - Tests took too long to run"
+
+    lines = []
+    for test in report.get("tests", []):
+        icon = {"passed": "✓", "skipped": "-", "expected_failure": "✓"}.get(test["outcome"], "✗")
+        lines.append(f"{icon} {test['name']} ... {test['outcome']}")
+        if test["outcome"] in ("failed", "error") and test.get("message"):
+            lines.append(test["message"].rstrip())
+
+    lines.append(f"Ran {report.get('tests_run', 0)} tests in {report.get('duration', 0):.3f}s")
+    if report.get("passed"):
+        lines.append("OK")
+        header = "✅ TESTS PASSED"
+    else:
+        lines.append(f"FAILED (failures={report.get('failures', 0)}, errors={report.get('errors', 0)})")
+        header = "❌ TESTS FAILED"
+
+    if report.get("error"):
+        lines.append(report["error"].rstrip())
+    if report.get("output"):
+        lines.append(report["output"].rstrip())
+
+    return f"{header}\n" + "\n".join(lines)
@@ -0,0 +1,255 @@
+"""
+Warm test runner worker
+RunnerPool starts these ahead of time with unittest already imported. Each
+worker blocks on stdin until a job arrives, runs it exactly once and exits,
+so every test run gets a fresh interpreter without paying startup latency.
+Before running a job the worker applies the job's resource limits to itself
+(POSIX only) and reports CPU time and peak RSS alongside the test results.
+"""
+
+import contextlib
+import io
+import json
+import os
+import signal
+import sys
+import time
+import traceback
+import unittest
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, the pool's wall-clock timeout still applies
+    resource = None
+
+RESULT_MARKER = "__RUNNER_RESULT__"
+SANDBOX_MODULE = "__sandbox__"
+
+
+def _test_name(test) -> str:
+    name = test.id()
+    prefix = f"{SANDBOX_MODULE}."
+    return name[len(prefix):] if name.startswith(prefix) else name
+
+
+class RecordingTestResult(unittest.TestResult):
+    """TestResult that keeps a structured record per test"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self._started = {}
+
+    def startTest(self, test):
+        super().startTest(test)
+        self._started[test.id()] = time.perf_counter()
+
+    def _record(self, test, outcome: str, message: str = ""):
+        started = self._started.pop(test.id(), None)
+        self.records.append({
+            "name": _test_name(test),
+            "outcome": outcome,
+            "message": message,
+            "duration": round(time.perf_counter() - started, 6) if started else None
+        })
+
+    def addSuccess(self, test):
+        super().addSuccess(test)
+        self._record(test, "passed")
+
+    def addFailure(self, test, err):
+        super().addFailure(test, err)
+        self._record(test, "failed", self.failures[-1][1])
+
+    def addError(self, test, err):
+        super().addError(test, err)
+        self._record(test, "error", self.errors[-1][1])
+
+    def addSkip(self, test, reason):
+        super().addSkip(test, reason)
+        self._record(test, "skipped", reason)
+
+    def addExpectedFailure(self, test, err):
+        super().addExpectedFailure(test, err)
+        self._record(test, "expected_failure")
+
+    def addUnexpectedSuccess(self, test):
+        super().addUnexpectedSuccess(test)
+        self._record(test, "unexpected_success")
+
+    def addSubTest(self, test, subtest, err):
+        super().addSubTest(test, subtest, err)
+        if err is not None:
+            outcome = "failed" if issubclass(err[0], test.failureException) else "error"
+            message = (self.failures if outcome == "failed" else self.errors)[-1][1]
+            self._record(subtest, outcome, message)
+
+
+def _collect_tests(namespace: dict) -> unittest.TestSuite:
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    for obj in list(namespace.values()):
+        if (isinstance(obj, type) and issubclass(obj, unittest.TestCase)
+                and obj.__module__ == SANDBOX_MODULE):
+            suite.addTests(loader.loadTestsFromTestCase(obj))
+    return suite
+
+
+def _user_task_count() -> int:
+    """Tasks (threads included) already owned by this uid; RLIMIT_NPROC counts every one of them"""
+    uid = os.getuid()
+    count = 0
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return 0
+    for entry in entries:
+        if entry.isdigit():
+            try:
+                if os.stat(f"/proc/{entry}").st_uid == uid:
+                    count += len(os.listdir(f"/proc/{entry}/task"))
+            except OSError:
+                continue
+    return count
+
+
+def _set_limit(name: str, soft: int, applied: dict, hard: int = None):
+    limit = getattr(resource, name, None)
+    if limit is None or soft <= 0:
+        return
+    hard = soft if hard is None else hard
+    _, current_hard = resource.getrlimit(limit)
+    if current_hard != resource.RLIM_INFINITY:
+        soft, hard = min(soft, current_hard), min(hard, current_hard)
+    try:
+        resource.setrlimit(limit, (soft, hard))
+        applied[name] = soft
+    except (ValueError, OSError):
+        pass
+
+
+def apply_limits(limits: dict) -> dict:
+    """Cap memory, CPU, processes and file size for the rest of this process' life"""
+    applied = {}
+    if resource is None or not limits:
+        return applied
+    if limits.get("memory_mb"):
+        _set_limit("RLIMIT_AS", int(limits["memory_mb"]) * 1024 * 1024, applied)
+    if limits.get("cpu_seconds"):
+        # RLIMIT_CPU counts from process start; the soft limit raises SIGXCPU, the hard one kills
+        used = resource.getrusage(resource.RUSAGE_SELF)
+        cpu_limit = int(used.ru_utime + used.ru_stime + limits["cpu_seconds"]) + 1
+        _set_limit("RLIMIT_CPU", cpu_limit, applied, hard=cpu_limit + 1)
+    if limits.get("max_processes"):
+        _set_limit("RLIMIT_NPROC", _user_task_count() + int(limits["max_processes"]), applied)
+    if limits.get("file_size_mb"):
+        # Oversized writes fail with EFBIG instead of killing the worker
+        signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+        _set_limit("RLIMIT_FSIZE", int(limits["file_size_mb"]) * 1024 * 1024, applied)
+    return applied
+
+
+def cpu_seconds() -> float:
+    """CPU time used so far by this worker plus any processes it waited for"""
+    if resource is None:
+        return 0.0
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return self_usage.ru_utime + self_usage.ru_stime + child_usage.ru_utime + child_usage.ru_stime
+
+
+def _peak_rss() -> int:
+    """Peak RSS in bytes since exec; on Linux ru_maxrss carries over the parent's high-water mark"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    rss_unit = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is KiB on Linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * rss_unit
+
+
+def resource_usage(cpu_baseline: float = 0.0) -> dict:
+    """CPU seconds since cpu_baseline and peak RSS (bytes) of the job"""
+    if resource is None:
+        return {"cpu_time": None, "peak_rss": None}
+    return {
+        "cpu_time": round(max(0.0, cpu_seconds() - cpu_baseline), 6),
+        "peak_rss": _peak_rss()
+    }
+
+
+@contextlib.contextmanager
+def _deferred_unittest_main():
+    """Make unittest.main() a no-op while generated code executes: an unguarded call would run the
+    tests at exec time and raise SystemExit; the worker collects and runs the TestCases itself"""
+    unittest_main = unittest.main
+    unittest.main = lambda *args, **kwargs: None
+    try:
+        yield
+    finally:
+        unittest.main = unittest_main
+
+
+def run_job(code: str, test_code: str) -> dict:
+    """Execute code + tests in a fresh namespace and report per-test results"""
+    report = {
+        "passed": False,
+        "tests_run": 0,
+        "failures": 0,
+        "errors": 0,
+        "skipped": 0,
+        "tests": [],
+        "output": "",
+        "error": None,
+        "timed_out": False,
+        "duration": 0.0
+    }
+    namespace = {"__name__": SANDBOX_MODULE, "__builtins__": __builtins__}
+    output = io.StringIO()
+    started = time.perf_counter()
+
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        try:
+            with _deferred_unittest_main():
+                exec(compile(f"{code}\n\n{test_code}", "<generated>", "exec"), namespace)
+        except (Exception, SystemExit):
+            report["error"] = traceback.format_exc()
+        else:
+            result = RecordingTestResult()
+            try:
+                _collect_tests(namespace).run(result)
+            except (Exception, SystemExit):
+                report["error"] = traceback.format_exc()
+            report.update({
+                "passed": report["error"] is None and result.wasSuccessful(),
+                "tests_run": result.testsRun,
+                "failures": len(result.failures),
+                "errors": len(result.errors),
+                "skipped": len(result.skipped),
+                "tests": result.records
+            })
+
+    report["duration"] = round(time.perf_counter() - started, 6)
+    report["output"] = output.getvalue()
+    return report
+
+
+def main():
+    payload = json.loads(sys.stdin.read() or "{}")
+    applied = apply_limits(payload.get("limits") or {})
+    # Interpreter startup and imports happened before the job arrived; don't charge them to it
+    cpu_baseline = cpu_seconds()
+    report = run_job(payload.get("code", ""), payload.get("test_code", ""))
+    report.update(resource_usage(cpu_baseline))
+    report["limits"] = applied
+    sys.__stdout__.write(f"\n{RESULT_MARKER}{json.dumps(report, default=str)}\n")
+    sys.__stdout__.flush()
+    # Skip interpreter teardown so stray user threads or atexit hooks can't hang the worker
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Test script for the content-addressed artifact store
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from artifact_store import ArtifactStore, is_safe_filename
+
+
+def test_dedup_and_listing():
+    print("🧪 Testing deduplicated writes...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ArtifactStore(Path(tmp))
+        first = store.put("code", "def add(a, b):\n    return a + b\n", workflow_id="w1")
+        second = store.put("code", "def add(a, b):\n    return a + b\n", workflow_id="w2")
+        tests = store.put("test", "import unittest\n")
+
+        assert first["filename"] == second["filename"] and second["deduplicated"]
+        assert second["refs"] == 2
+        assert first["filename"].startswith("code_") and tests["filename"].startswith("test_")
+        assert len(list(Path(tmp).glob("*.py"))) == 2
+
+        assert [a["filename"] for a in store.list()] == [tests["filename"], first["filename"]]
+        assert [a["filename"] for a in store.list(kind="code")] == [first["filename"]]
+        assert store.path_for(first["filename"]).read_text() == "def add(a, b):\n    return a + b\n"
+        assert store.stats()["dedup_hits"] == 1
+
+        for run in ("w1", "w2"):
+            page = store.list_page(workflow_id=run)["items"]
+            assert [(a["filename"], a["workflow_id"]) for a in page] == [(first["filename"], run)], \
+                "deduplicated artifacts must stay listed under every run that produced them"
+        store.close()
+    print("✅ Identical generations share one file")
+
+
+def test_path_validation():
+    print("🧪 Testing file name validation...")
+    assert is_safe_filename("code_abc123.py")
+    for name in ("../main.py", "..py", "sub/dir.py", ".manifest.db", "code.txt"):
+        assert not is_safe_filename(name), name
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ArtifactStore(Path(tmp))
+        assert store.path_for("../main.py") is None
+        assert store.path_for("code_missing.py") is None
+        store.close()
+    print("✅ Unsafe and unknown names are rejected")
+
+
+def test_cursor_pagination():
+    print("🧪 Testing cursor pagination...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ArtifactStore(Path(tmp), gc_every=0)
+        for i in range(7):
+            store.put("code" if i % 2 else "test", "x" * (i + 1) + "\n", workflow_id=f"run_{i % 3}")
+
+        seen, cursor = [], None
+        while True:
+            page = store.list_page(limit=3, cursor=cursor)
+            seen.extend(a["filename"] for a in page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == [a["filename"] for a in store.list()], "pages must cover the catalog exactly once"
+        assert [a["filename"] for a in store.list_all()] == seen
+
+        by_size = store.list_page(limit=2, sort="size", order="asc")
+        assert [a["size"] for a in by_size["items"]] == [2, 3]
+        second = store.list_page(limit=2, sort="size", order="asc", cursor=by_size["next_cursor"])
+        assert [a["size"] for a in second["items"]] == [4, 5]
+
+        assert {a["workflow_id"] for a in store.list_page(workflow_id="run_1")["items"]} == {"run_1"}
+        assert all(a["kind"] == "code" for a in store.list_page(kind="code")["items"])
+        assert len(store.list_page(prefix="test_")["items"]) == 4
+        for bad in ({"sort": "digest"}, {"cursor": "not-a-cursor"}):
+            try:
+                store.list_page(**bad)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(f"{bad} should be rejected")
+        store.close()
+    print("✅ Pages are stable under sorting and filtering")
+
+
+def test_legacy_import_and_gc():
+    print("🧪 Testing legacy import and GC...")
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = Path(tmp) / "code_20240101_120000.py"
+        legacy.write_text("print('old')\n")
+        old = time.time() - 3600
+        os.utime(legacy, (old, old))
+
+        store = ArtifactStore(Path(tmp), max_artifacts=2, gc_every=0)
+        assert store.import_existing() == 1
+        assert store.get(legacy.name)["kind"] == "code"
+
+        assert store.gc(max_age_seconds=60) == 0
+        assert legacy.exists(), "legacy files are still read by name, so GC must keep them"
+
+        names = []
+        for i in range(4):
+            names.append(store.put("code", f"x = {i}\n")["filename"])
+            time.sleep(0.01)
+        assert store.gc() == 2
+        assert [a["filename"] for a in store.list()] == [names[3], names[2], legacy.name]
+        assert store.stats()["artifacts"] == 3
+        store.close()
+    print("✅ Legacy files indexed and retention enforced")
+
+
+def test_boot_keeps_old_legacy_files():
+    print("🧪 Testing first boot with old legacy files...")
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = Path(tmp) / "test_20230101_090000.py"
+        legacy.write_text("import unittest\n")
+        ancient = time.time() - 400 * 24 * 3600
+        os.utime(legacy, (ancient, ancient))
+
+        # Same sequence as server startup, with retention limits configured
+        store = ArtifactStore(Path(tmp), max_age_seconds=30 * 24 * 3600, max_artifacts=1)
+        store.import_existing()
+        store.put("code", "x = 1\n")
+        store.put("code", "x = 2\n")
+        store.gc()
+        assert legacy.exists() and store.get(legacy.name) is not None
+        store.close()
+
+        reopened = ArtifactStore(Path(tmp))
+        assert reopened.gc(max_age_seconds=1) == 0 and legacy.exists()
+        reopened.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Manifests created before the legacy column are migrated on open
+        db = sqlite3.connect(str(Path(tmp) / ".manifest.db"))
+        db.execute(
+            "CREATE TABLE artifacts (filename TEXT PRIMARY KEY, kind TEXT NOT NULL, digest TEXT NOT NULL, "
+            "size INTEGER NOT NULL, created_at REAL NOT NULL, last_used_at REAL NOT NULL, "
+            "refs INTEGER NOT NULL DEFAULT 1, workflow_id TEXT)"
+        )
+        db.close()
+        store = ArtifactStore(Path(tmp))
+        store.put("code", "x = 1\n", workflow_id="w1")
+        assert store.gc(max_age_seconds=3600) == 0
+        store.close()
+    print("✅ Old legacy files survive startup GC")
+
+
+if __name__ == "__main__":
+    test_dedup_and_listing()
+    test_path_validation()
+    test_cursor_pagination()
+    test_legacy_import_and_gc()
+    test_boot_keeps_old_legacy_files()
+    print("🎉 All artifact store tests passed!")
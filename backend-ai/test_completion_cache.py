@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Test script for the prompt -> completion cache
+"""
+
+import os
+import tempfile
+import time
+
+from completion_cache import CompletionCache
+
+CONFIG = {"temperature": 0.3, "num_ctx": 4096}
+
+
+def test_memory_tier():
+    print("🧪 Testing in-memory LRU tier...")
+    cache = CompletionCache(max_entries=2)
+    cache.put("mistral", CONFIG, "write  a\n function", "def f(): pass")
+
+    assert cache.get("mistral", CONFIG, "write a function") == "def f(): pass"
+    assert cache.get("mistral", {**CONFIG, "temperature": 0.7}, "write a function") is None
+    assert cache.get("llama2", CONFIG, "write a function") is None
+
+    cache.put("mistral", CONFIG, "b", "B")
+    cache.put("mistral", CONFIG, "c", "C")
+    assert cache.get("mistral", CONFIG, "write a function") is None, "oldest entry should be evicted"
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["memory_entries"] == 2
+    print(f"✅ Memory tier works: {stats}")
+
+
+def test_disk_tier():
+    print("🧪 Testing SQLite tier...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "completions.db")
+        CompletionCache(db_path=db_path).put("mistral", CONFIG, "prompt", "answer")
+
+        reopened = CompletionCache(db_path=db_path)
+        assert reopened.get("mistral", CONFIG, "prompt") == "answer"
+        assert reopened.stats()["disk_hits"] == 1
+
+        expired = CompletionCache(db_path=db_path, ttl_seconds=0)
+        time.sleep(0.01)
+        assert expired.get("mistral", CONFIG, "prompt") is None
+
+        capped = CompletionCache(max_entries=1, db_path=db_path, max_disk_entries=2)
+        for i in range(5):
+            capped.put("mistral", CONFIG, f"p{i}", f"a{i}")
+        rows = capped._db.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        assert rows == 2, rows
+        for cache in (reopened, expired, capped):
+            cache._db.close()
+    print("✅ Disk tier persists, expires and evicts")
+
+
+if __name__ == "__main__":
+    test_memory_tier()
+    test_disk_tier()
+    print("🎉 All completion cache tests passed!")
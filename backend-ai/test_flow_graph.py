@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test script for flow graph compilation and concurrent execution
+"""
+
+import asyncio
+import time
+
+from flow_graph import FlowGraphError, compile_flow, compile_flow_cached, execute_flow, plan_cache_stats
+
+
+def test_compile_orders_and_levels():
+    print("🧪 Testing graph compilation...")
+    plan = compile_flow(
+        ["coder", "reviewer", "tester", "runner"],
+        [("coder", "reviewer"), ("coder", "tester"), ("reviewer", "runner"), ("tester", "runner")]
+    )
+    assert plan.order == ["coder", "reviewer", "tester", "runner"]
+    assert plan.levels == [["coder"], ["reviewer", "tester"], ["runner"]]
+    assert plan.entry_nodes == ["coder"] and plan.exit_nodes == ["runner"]
+    print("✅ Compiled into 3 parallel stages")
+
+
+def test_invalid_graphs():
+    print("🧪 Testing invalid graphs...")
+    for edges in ([("a", "b"), ("b", "a")], [("a", "missing")]):
+        try:
+            compile_flow(["a", "b"], edges)
+        except FlowGraphError as e:
+            print(f"✅ Rejected: {e}")
+        else:
+            raise AssertionError(f"{edges} should be rejected")
+
+
+def test_plan_cache():
+    print("🧪 Testing compiled plan cache...")
+    nodes, edges = ["a", "b"], [("a", "b")]
+    first = compile_flow_cached(nodes, edges)
+    hits = plan_cache_stats()["hits"]
+    assert compile_flow_cached(list(nodes), list(edges)) is first
+    assert plan_cache_stats()["hits"] == hits + 1
+    assert compile_flow_cached(nodes, []) is not first
+    print("✅ Identical canvases reuse the compiled plan")
+
+
+def test_parallel_execution():
+    print("🧪 Testing parallel execution...")
+    plan = compile_flow(["a", "b", "c", "d"], [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")])
+    seen_inputs = {}
+
+    async def run_node(node, inputs):
+        seen_inputs[node] = inputs
+        await asyncio.sleep(0.2)
+        return node.upper()
+
+    started = time.perf_counter()
+    results = asyncio.run(execute_flow(plan, run_node))
+    elapsed = time.perf_counter() - started
+
+    assert results == {"a": "A", "b": "B", "c": "C", "d": "D"}
+    assert seen_inputs["d"] == {"b": "B", "c": "C"}
+    assert elapsed < 0.75, f"b and c should overlap (took {elapsed:.2f}s)"
+    print(f"✅ Critical path of 3 stages ran in {elapsed:.2f}s")
+
+
+def test_limiter():
+    print("🧪 Testing concurrency limiter...")
+    plan = compile_flow(["root", "x", "y", "z"], [("root", "x"), ("root", "y"), ("root", "z")])
+    running = {"now": 0, "peak": 0}
+
+    async def run_node(node, inputs):
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        await asyncio.sleep(0.05)
+        running["now"] -= 1
+
+    async def main():
+        semaphore = asyncio.Semaphore(1)
+        await execute_flow(plan, run_node, limiter=lambda node: semaphore)
+
+    asyncio.run(main())
+    assert running["peak"] == 1
+    print("✅ Limiter bounded concurrency")
+
+
+if __name__ == "__main__":
+    test_compile_orders_and_levels()
+    test_invalid_graphs()
+    test_plan_cache()
+    test_parallel_execution()
+    test_limiter()
+    print("🎉 All flow graph tests passed!")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test script for the inference scheduler
+Runs without the API server or Ollama
+"""
+
+import asyncio
+
+from inference_scheduler import PRIORITY_NORMAL, PRIORITY_SHORT, InferenceScheduler, SchedulerOverloaded
+
+
+async def _generate(scheduler, order, name, model="mistral", tenant="default", priority=PRIORITY_NORMAL):
+    async with scheduler.slot(model, tenant=tenant, priority=priority):
+        order.append(name)
+        await asyncio.sleep(0.01)
+
+
+def test_fair_and_prioritized():
+    print("🧪 Testing fairness across conversations and short-task priority...")
+
+    async def scenario():
+        scheduler = InferenceScheduler(max_concurrency_per_model=1)
+        order = []
+        tasks = [asyncio.create_task(_generate(scheduler, order, "busy-0", tenant="busy"))]
+        await asyncio.sleep(0)
+        for i in range(1, 4):
+            tasks.append(asyncio.create_task(_generate(scheduler, order, f"busy-{i}", tenant="busy")))
+        tasks.append(asyncio.create_task(_generate(scheduler, order, "quiet-0", tenant="quiet")))
+        tasks.append(asyncio.create_task(_generate(scheduler, order, "plan", tenant="other", priority=PRIORITY_SHORT)))
+        await asyncio.sleep(0)
+        depth = scheduler.stats()["models"]["mistral"]
+        await asyncio.gather(*tasks)
+        return order, depth, scheduler.stats()
+
+    order, depth, stats = asyncio.run(scenario())
+    assert depth["running"] == 1 and depth["queued"] == 5 and depth["queued_by_priority"] == {"short": 1, "normal": 4}
+    assert order[:4] == ["busy-0", "plan", "busy-1", "quiet-0"], order
+    assert stats["models"]["mistral"]["completed"] == 6 and stats["running"] == 0
+    print(f"✅ Served in order {order}")
+
+
+def test_caps_and_load_shedding():
+    print("🧪 Testing concurrency caps and overload rejection...")
+
+    async def scenario():
+        scheduler = InferenceScheduler(max_concurrency_per_model=2, max_total_concurrency=2, max_queue_depth=2)
+        peak = {"running": 0}
+        release = asyncio.Event()
+
+        async def hold(model):
+            async with scheduler.slot(model):
+                peak["running"] = max(peak["running"], scheduler.running)
+                await release.wait()
+
+        holders = [asyncio.create_task(hold(model)) for model in ("mistral", "mistral", "llama2", "llama2")]
+        await asyncio.sleep(0)
+        try:
+            async with scheduler.slot("llama2"):
+                raise AssertionError("a full queue must reject new work")
+        except SchedulerOverloaded as e:
+            rejected = e
+        cancelled = asyncio.create_task(hold("mistral"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        queued_after_cancel = scheduler.stats()["queued"]
+        release.set()
+        await asyncio.gather(*holders)
+        return scheduler, peak["running"], rejected, queued_after_cancel
+
+    scheduler, peak, rejected, queued_after_cancel = asyncio.run(scenario())
+    assert peak == 2, "the total cap applies across models"
+    assert rejected.model == "llama2" and rejected.retry_after >= 1
+    assert queued_after_cancel == 2, "cancelled waiters leave the queue"
+    assert scheduler.stats()["models"]["llama2"]["rejected"] == 1 and scheduler.running == 0
+    print(f"✅ Overload rejected with Retry-After {rejected.retry_after}s")
+
+
+if __name__ == "__main__":
+    test_fair_and_prioritized()
+    test_caps_and_load_shedding()
+    print("🎉 All inference scheduler tests passed!")
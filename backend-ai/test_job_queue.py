@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test script for the background job queue
+"""
+
+import asyncio
+
+from job_queue import JobQueue
+
+
+def test_jobs_run_in_background():
+    print("🧪 Testing job execution and concurrency...")
+
+    async def scenario():
+        queue = JobQueue(concurrency=1)
+        order = []
+
+        def work(name, delay):
+            async def run():
+                await asyncio.sleep(delay)
+                order.append(name)
+                return {"name": name}
+            return run
+
+        async def broken():
+            raise RuntimeError("model unavailable")
+
+        first = queue.submit("chat", work("first", 0.05), job_id="workflow_1")
+        second = queue.submit("chat", work("second", 0.0))
+        failed = queue.submit("chat", broken)
+        assert first.status == "queued", "submit must not wait for the job"
+
+        while not failed.finished:
+            await asyncio.sleep(0.01)
+        try:
+            queue.submit("chat", work("again", 0))
+            queue.submit("chat", work("duplicate", 0), job_id=second.job_id)
+        except ValueError:
+            raise AssertionError("finished job ids may be reused")
+        await queue.shutdown()
+        return queue, first, second, failed, order
+
+    queue, first, second, failed, order = asyncio.run(scenario())
+    assert order == ["first", "second"], "concurrency=1 runs jobs in submission order"
+    assert first.status == "completed" and first.to_dict()["result"] == {"name": "first"}
+    assert failed.status == "failed" and failed.error == "model unavailable"
+    assert queue.get("workflow_1") is first
+    print("✅ Jobs run in the background in FIFO order")
+
+
+def test_cancellation():
+    print("🧪 Testing job cancellation...")
+
+    async def scenario():
+        queue = JobQueue(concurrency=1)
+        interrupted = asyncio.Event()
+
+        async def long_running():
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                interrupted.set()
+                raise
+
+        running = queue.submit("workflow", long_running)
+        waiting = queue.submit("workflow", long_running)
+        await asyncio.sleep(0.05)
+        assert running.status == "running" and waiting.status == "queued"
+
+        assert queue.cancel(waiting.job_id)
+        assert queue.cancel(running.job_id)
+        await asyncio.wait_for(interrupted.wait(), 1)
+        await asyncio.sleep(0.01)
+        assert not queue.cancel(running.job_id), "finished jobs cannot be cancelled"
+        stats = queue.stats()
+        await queue.shutdown()
+        return running, waiting, stats
+
+    running, waiting, stats = asyncio.run(scenario())
+    assert running.status == "cancelled" and waiting.status == "cancelled"
+    assert waiting.started_at is None, "cancelled queued jobs never start"
+    assert stats["cancelled"] == 2 and stats["running"] == 0
+    print("✅ Cancellation reaches queued and running jobs")
+
+
+if __name__ == "__main__":
+    test_jobs_run_in_background()
+    test_cancellation()
+    print("🎉 All job queue tests passed!")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test script for the coordinator planner
+"""
+
+from planner import IncrementalPlanParser, TaskPlanner, extract_json_object, rule_based_plan, validate_steps
+
+
+def test_rule_based_plans():
+    print("🧪 Testing rule-based planner...")
+    steps = rule_based_plan("Write a Python function that reverses a string")
+    assert [step["agent"] for step in steps] == ["coder", "tester"]
+    assert steps[0]["task"] == "Write a Python function that reverses a string"
+    assert rule_based_plan("Push my code to a GitHub repo called demo") is None
+    assert rule_based_plan("What is the weather like?") is None
+    print("✅ Common coding prompts are planned without the model")
+
+
+def test_tolerant_json():
+    print("🧪 Testing tolerant JSON extraction...")
+    response = 'Sure! Here is the plan:\n```json\n{"steps": [{"agent": "Coder", "task": "Write it", "priority": "1"}]}\n```\nGood luck.'
+    steps = validate_steps(extract_json_object(response))
+    assert steps == [{"agent": "coder", "task": "Write it", "priority": 1}]
+    assert extract_json_object("no json here") is None
+    assert validate_steps({"steps": [{"agent": "wizard", "task": "magic"}]}) is None
+    print("✅ Plans decoded from noisy model output")
+
+
+def test_streaming_parse():
+    print("🧪 Testing incremental plan parsing...")
+    document = '{"steps": [{"agent": "coder", "task": "Write {braces} and \\"quotes\\""}, {"agent": "ghost", "task": "x"}, {"agent": "tester", "task": "Test it"}]}'
+    parser = IncrementalPlanParser()
+    emitted = []
+    for i in range(0, len(document), 7):
+        for step in parser.feed(document[i:i + 7]):
+            emitted.append((i, step["agent"]))
+
+    assert [agent for _, agent in emitted] == ["coder", "tester"]
+    assert emitted[0][0] < len(document) // 2, "first step should be available before the plan finishes"
+    assert parser.steps[0]["task"] == 'Write {braces} and "quotes"'
+    assert parser.rejected == 1
+
+    planner = TaskPlanner()
+    steps = planner.decode("stream task", document, streamed=parser)
+    assert [step["agent"] for step in steps] == ["coder", "tester"]
+    stats = planner.stats()
+    assert stats["streamed_steps"] == 2 and stats["rejected_steps"] == 1 and stats["parse_failure_rate"] == 0.0
+    print("✅ Steps dispatched while the plan streams")
+
+
+def test_plan_cache():
+    print("🧪 Testing plan cache...")
+    planner = TaskPlanner()
+    task = "Summarize the differences between two sorting approaches"
+    assert planner.plan_without_llm(task) is None
+
+    steps = planner.decode(task, '{"steps": [{"agent": "coder", "task": "Compare them", "priority": 1}]}')
+    assert steps[0]["task"] == "Compare them"
+    assert planner.plan_without_llm("  summarize the differences between   two sorting approaches ") == steps
+
+    fallback = planner.decode("something else", "not json")
+    assert [step["agent"] for step in fallback] == ["coder", "tester"]
+    assert planner.plan_without_llm("something else") is None, "fallback plans are not cached"
+
+    stats = planner.stats()
+    assert stats["cache_hits"] == 1 and stats["llm_plans"] == 1 and stats["fallbacks"] == 1
+    assert stats["parse_failure_rate"] == 0.5
+    print(f"✅ Plan cache works: {stats}")
+
+
+if __name__ == "__main__":
+    test_rule_based_plans()
+    test_tolerant_json()
+    test_streaming_parse()
+    test_plan_cache()
+    print("🎉 All planner tests passed!")
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Test script for the warm test runner pool
+Runs without the API server or Ollama
+"""
+
+import asyncio
+import sys
+import time
+
+from runner_pool import RunnerPool, TestResultCache, format_test_report
+
+CODE = '''
+def add(a, b):
+    return a + b
+'''
+
+PASSING_TESTS = '''
+import unittest
+
+class TestAdd(unittest.TestCase):
+    def test_add(self):
+        self.assertEqual(add(2, 3), 5)
+
+    def test_negative(self):
+        self.assertEqual(add(-1, -1), -2)
+
+if __name__ == "__main__":
+    unittest.main()
+'''
+
+FAILING_TESTS = '''
+import unittest
+
+class TestAdd(unittest.TestCase):
+    def test_add(self):
+        self.assertEqual(add(2, 3), 5)
+
+    def test_wrong(self):
+        print("debug output")
+        self.assertEqual(add(2, 2), 5)
+'''
+
+
+UNGUARDED_MAIN_TESTS = '''
+import unittest
+
+class TestAdd(unittest.TestCase):
+    def test_add(self):
+        self.assertEqual(add(2, 3), 5)
+
+unittest.main()
+'''
+
+THREADED_CODE = '''
+import threading
+
+def add_in_thread(a, b):
+    result = []
+    worker = threading.Thread(target=lambda: result.append(a + b))
+    worker.start()
+    worker.join()
+    return result[0]
+'''
+
+THREADED_TESTS = '''
+import unittest
+
+class TestThreaded(unittest.TestCase):
+    def test_add_in_thread(self):
+        self.assertEqual(add_in_thread(2, 3), 5)
+'''
+
+
+async def _run(pool, code, tests):
+    return await pool.run(code, tests)
+
+
+def test_passing_run():
+    print("🧪 Testing passing run...")
+    pool = RunnerPool(size=1, timeout=30)
+    pool.start()
+    try:
+        report = asyncio.run(_run(pool, CODE, PASSING_TESTS))
+        assert report["passed"], report
+        assert report["tests_run"] == 2
+        assert {t["name"] for t in report["tests"]} == {"TestAdd.test_add", "TestAdd.test_negative"}
+        assert format_test_report(report).startswith("✅ TESTS PASSED")
+        print("✅ Passing run reported per-test results")
+    finally:
+        pool.shutdown()
+
+
+def test_failing_run():
+    print("🧪 Testing failing run...")
+    pool = RunnerPool(size=1, timeout=30)
+    try:
+        report = asyncio.run(_run(pool, CODE, FAILING_TESTS))
+        assert not report["passed"]
+        assert report["failures"] == 1
+        outcomes = {t["name"]: t["outcome"] for t in report["tests"]}
+        assert outcomes == {"TestAdd.test_add": "passed", "TestAdd.test_wrong": "failed"}
+        assert "debug output" in report["output"]
+        assert format_test_report(report).startswith("❌ TESTS FAILED")
+        print("✅ Failing run reported the failing test")
+    finally:
+        pool.shutdown()
+
+
+def test_unguarded_unittest_main():
+    print("🧪 Testing tests that call unittest.main() at module level...")
+    pool = RunnerPool(size=1, timeout=30)
+    try:
+        report = asyncio.run(_run(pool, CODE, UNGUARDED_MAIN_TESTS))
+        assert report["passed"] and report["tests_run"] == 1 and report["error"] is None, report
+        print("✅ unittest.main() no longer aborts the run")
+    finally:
+        pool.shutdown()
+
+
+def test_syntax_error():
+    print("🧪 Testing syntax error...")
+    pool = RunnerPool(size=1, timeout=30)
+    try:
+        report = asyncio.run(_run(pool, "def broken(:\n    pass", PASSING_TESTS))
+        assert not report["passed"]
+        assert "SyntaxError" in report["error"]
+        print("✅ Syntax error reported")
+    finally:
+        pool.shutdown()
+
+
+def test_timeout():
+    print("🧪 Testing timeout...")
+    pool = RunnerPool(size=1, timeout=2)
+    try:
+        report = asyncio.run(_run(pool, "while True:\n    pass", PASSING_TESTS))
+        assert report["timed_out"]
+        assert format_test_report(report) == "❌ TESTS TIMEOUT - Tests took too long to run"
+        print("✅ Runaway code was killed after the timeout")
+    finally:
+        pool.shutdown()
+
+
+def test_result_cache():
+    print("🧪 Testing test result cache...")
+    pool = RunnerPool(size=1, timeout=30, result_cache=TestResultCache(max_entries=1))
+
+    async def scenario():
+        first, second = await asyncio.gather(pool.run(CODE, PASSING_TESTS), pool.run(CODE, PASSING_TESTS))
+        third = await pool.run(CODE, PASSING_TESTS)
+        third["tests"].clear()
+        fourth = await pool.run(CODE, PASSING_TESTS)
+        return first, second, third, fourth
+
+    try:
+        first, second, third, fourth = asyncio.run(scenario())
+        assert first["passed"] and second["passed"]
+        assert pool.stats()["runs"] == 1, "concurrent identical runs should execute once"
+        assert third.get("cached") and len(fourth["tests"]) == 2, "cached reports are copies"
+
+        asyncio.run(_run(pool, CODE, FAILING_TESTS))
+        assert pool.stats()["runs"] == 2
+        asyncio.run(_run(pool, CODE, PASSING_TESTS))
+        assert pool.stats()["runs"] == 3, "LRU size 1 should have evicted the passing report"
+        print(f"✅ Duplicate executions served from cache: {pool.stats()['result_cache']}")
+    finally:
+        pool.shutdown()
+
+
+def test_timeouts_not_cached():
+    print("🧪 Testing timeouts bypass the cache...")
+    pool = RunnerPool(size=1, timeout=2, result_cache=TestResultCache())
+    try:
+        for _ in range(2):
+            assert asyncio.run(_run(pool, "while True:\n    pass", PASSING_TESTS))["timed_out"]
+        assert pool.stats()["runs"] == 2
+        print("✅ Timed-out runs are retried")
+    finally:
+        pool.shutdown()
+
+
+def test_sandbox_limits():
+    print("🧪 Testing sandbox limits...")
+    limits = {"memory_mb": 256, "cpu_seconds": 1, "max_processes": 16, "file_size_mb": 1}
+    pool = RunnerPool(size=1, timeout=15, limits=limits)
+    try:
+        report = asyncio.run(_run(pool, CODE, PASSING_TESTS))
+        assert report["passed"] and report["cpu_time"] > 0 and report["peak_rss"] > 0 and report["wall_time"] > 0
+        assert sys.platform == "win32" or report["limits"]["RLIMIT_AS"] == 256 * 1024 * 1024
+
+        if sys.platform != "win32":
+            hog = asyncio.run(_run(pool, "blob = bytearray(1024 * 1024 * 1024)", PASSING_TESTS))
+            assert not hog["passed"] and "MemoryError" in hog["error"] and hog["limit_exceeded"]
+
+            writer = asyncio.run(_run(pool, "open('big.bin', 'wb').write(b'x' * 2 * 1024 * 1024)", PASSING_TESTS))
+            assert "File too large" in writer["error"] and writer["limit_exceeded"]
+
+            threaded = asyncio.run(_run(pool, THREADED_CODE, THREADED_TESTS))
+            assert threaded["passed"], "threads under the process limit must start: " + str(threaded["error"] or threaded["tests"])
+
+            spinner = asyncio.run(_run(pool, "while True:\n    pass", PASSING_TESTS))
+            assert not spinner["timed_out"], "the CPU limit should stop it before the wall-clock timeout"
+            assert spinner["error"] == "CPU time limit exceeded" and spinner["limit_exceeded"]
+        print(f"✅ Limits enforced (cpu_time={report['cpu_time']}s, peak_rss={report['peak_rss'] // 1024} KiB)")
+    finally:
+        pool.shutdown()
+
+
+def test_cancellation_kills_worker():
+    print("🧪 Testing cancelled runs kill their worker...")
+    pool = RunnerPool(size=1, timeout=30, result_cache=TestResultCache())
+
+    async def scenario():
+        run = asyncio.ensure_future(pool.run("import time\ntime.sleep(20)", PASSING_TESTS))
+        await asyncio.sleep(1)
+        started = time.perf_counter()
+        run.cancel()
+        try:
+            await run
+        except asyncio.CancelledError:
+            pass
+        # The worker thread returns as soon as the killed process exits
+        while pool.stats()["runs"] == 0:
+            await asyncio.sleep(0.05)
+        return time.perf_counter() - started
+
+    try:
+        elapsed = asyncio.run(scenario())
+        stats = pool.stats()
+        assert elapsed < 5 and stats["cancelled"] == 1, stats
+        assert stats["result_cache"]["entries"] == 0, "killed runs must not be cached"
+        print(f"✅ Worker killed {elapsed:.2f}s after cancellation")
+    finally:
+        pool.shutdown()
+
+
+def test_resubmit_after_cancel():
+    print("🧪 Testing resubmission right after a cancelled run...")
+    pool = RunnerPool(size=1, timeout=30, result_cache=TestResultCache())
+    slow_code = "import time\ntime.sleep(1)\n" + CODE
+
+    async def scenario():
+        first = asyncio.ensure_future(pool.run(slow_code, PASSING_TESTS))
+        await asyncio.sleep(0.3)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        return await pool.run(slow_code, PASSING_TESTS)
+
+    try:
+        report = asyncio.run(scenario())
+        assert report["passed"], "the resubmission must get its own run, not the killed one"
+        assert not pool._pending and not pool._active and not pool._waiters
+        print("✅ Resubmitted run executed on its own")
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    test_passing_run()
+    test_failing_run()
+    test_unguarded_unittest_main()
+    test_syntax_error()
+    test_timeout()
+    test_result_cache()
+    test_timeouts_not_cached()
+    test_sandbox_limits()
+    test_cancellation_kills_worker()
+    test_resubmit_after_cancel()
+    print("🎉 All runner pool tests passed!")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Test script for the workflow run store
+"""
+
+from workflow_runs import WorkflowRunStore
+
+
+def test_runs_are_isolated():
+    print("🧪 Testing per-workflow results...")
+    store = WorkflowRunStore()
+    first = store.start("workflow_1", "add numbers")
+    second = store.start("workflow_2", "reverse a string")
+
+    first.record(code="def add(a, b): return a + b")
+    second.record(code="def rev(s): return s[::-1]", tests="import unittest")
+    first.record(code="def add(a, b): return 0")
+
+    assert store.get("workflow_1").get("code") == "def add(a, b): return a + b", "first write wins"
+    assert store.get("workflow_1").get("tests") is None
+    assert store.get("workflow_2").get("tests") == "import unittest"
+
+    seen = []
+    first.listener = seen.append
+    first.record(code="ignored", tests="import unittest")
+    assert seen == [{"tests": "import unittest"}], "listeners only see newly recorded fields"
+    print("✅ Concurrent runs never see each other's results")
+
+
+def test_timings_and_bounds():
+    print("🧪 Testing timings and eviction...")
+    store = WorkflowRunStore(max_runs=2)
+    run = store.start("a", "task")
+    run.add_timing("coder", 1.25)
+    run.add_timing("coder", 0.5)
+    run.finish("completed")
+
+    data = run.to_dict()
+    assert data["timings"] == {"coder": 1.75} and data["status"] == "completed"
+
+    store.start("b", "task")
+    store.start("c", "task")
+    assert store.get("a") is None and store.stats()["runs"] == 2
+    try:
+        run.record(unknown="x")
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("unknown fields should be rejected")
+    print("✅ Timings accumulate and old runs are evicted")
+
+
+if __name__ == "__main__":
+    test_runs_are_isolated()
+    test_timings_and_bounds()
+    print("🎉 All workflow run tests passed!")
@@ -0,0 +1,92 @@
+"""
+Per-workflow result records
+Agents write their outputs (code, tests, test results, timings) into the run
+for their workflow id, so endpoints read results in O(1) instead of scanning
+agent memory or the generated files directory
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+RESULT_FIELDS = ("plan", "code", "tests", "test_results", "tests_passed", "test_report", "code_file", "test_file")
+
+
+class WorkflowRun:
+    """Results of one workflow; each field is written once, by the agent that produces it"""
+
+    def __init__(self, workflow_id: str, prompt: str):
+        self.workflow_id = workflow_id
+        self.prompt = prompt
+        self.status = "running"
+        self.results: Dict[str, Any] = {}
+        self.timings: Dict[str, float] = {}
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.listener: Optional[Callable[[Dict[str, Any]], None]] = None
+        self._lock = threading.Lock()
+
+    def record(self, **fields: Any):
+        """Store result fields; the first write wins so retries or duplicate messages can't overwrite"""
+        recorded = {}
+        with self._lock:
+            for name, value in fields.items():
+                if name not in RESULT_FIELDS:
+                    raise KeyError(f"Unknown workflow result field '{name}'")
+                if value is not None and name not in self.results:
+                    self.results[name] = value
+                    recorded[name] = value
+        # Listeners see each newly recorded stage once, e.g. to stream it to a client
+        if recorded and self.listener:
+            self.listener(recorded)
+
+    def add_timing(self, agent_id: str, seconds: float):
+        with self._lock:
+            self.timings[agent_id] = round(self.timings.get(agent_id, 0.0) + seconds, 3)
+
+    def finish(self, status: str):
+        with self._lock:
+            self.status = status
+            self.finished_at = time.time()
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.results.get(name, default)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                "workflow_id": self.workflow_id,
+                "prompt": self.prompt,
+                "status": self.status,
+                **{name: self.results.get(name) for name in RESULT_FIELDS},
+                "timings": dict(self.timings),
+                "duration": round(end - self.started_at, 3)
+            }
+
+
+class WorkflowRunStore:
+    """Bounded in-memory index of recent runs keyed by workflow id"""
+
+    def __init__(self, max_runs: int = 500):
+        self.max_runs = max_runs
+        self._runs: "OrderedDict[str, WorkflowRun]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, workflow_id: str, prompt: str) -> WorkflowRun:
+        run = WorkflowRun(workflow_id, prompt)
+        with self._lock:
+            self._runs[workflow_id] = run
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+        return run
+
+    def get(self, workflow_id: str) -> Optional[WorkflowRun]:
+        with self._lock:
+            return self._runs.get(workflow_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            running = sum(1 for run in self._runs.values() if run.status == "running")
+            return {"runs": len(self._runs), "running": running, "max_runs": self.max_runs}